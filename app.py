@@ -1,13 +1,24 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
 import os
-import json
 import hashlib
 import re
-from datetime import datetime, timedelta
+import time
+import threading
+import functools
+from datetime import datetime
+
+import bot_cache
+import bot_client
+import bot_worker
+import charts
+import data_store
+import engine
+import live_data
+import perf
+import sql_store
+import tables
+import user_store
 
 # Set page configuration
 st.set_page_config(
@@ -15,6 +26,7 @@ st.set_page_config(
     page_icon="https://res.cloudinary.com/dnq8ne9lx/image/upload/v1753860594/infograph_ewfmm6.ico",
     layout="wide"
 )
+rerun_start = time.perf_counter()
 
 # ─────────────────────────────────────────────
 # AUTH CONFIG
@@ -70,26 +82,17 @@ HARDCODED_USERS = {
     },
 }
 
+# One store per process (user_store.py): reads are served from memory until
+# the file's mtime changes; writes are locked read-modify-write operations.
+@st.cache_resource
+def get_user_store() -> user_store.UserStore:
+    return user_store.UserStore(USERS_FILE, HARDCODED_USERS)
+
 def load_users() -> dict:
-    users = {k: v.copy() for k, v in HARDCODED_USERS.items()}
-    if os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, "r") as f:
-                saved = json.load(f)
-            for email, info in saved.items():
-                if email not in HARDCODED_USERS:
-                    users[email] = info
-                else:
-                    users[email]["active"] = info.get("active", True)
-                    if info.get("role"):
-                        users[email]["role"] = info["role"]
-        except Exception:
-            pass
-    return users
+    return get_user_store().load()
 
-def save_users(users: dict):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=2)
+def update_users(mutate):
+    return get_user_store().update(mutate)
 
 def is_valid_email(email: str) -> bool:
     return bool(re.match(r'^[\w.\-+]+@little\.africa$', email.strip().lower()))
@@ -173,20 +176,24 @@ def show_admin_panel():
         new_role     = st.selectbox("Role", ["user", "admin"], key="new_role")
         if st.button("Add User", key="add_user_btn"):
             new_email_clean = new_email.strip().lower()
+            def add_user(latest):
+                if new_email_clean in latest:
+                    return False
+                latest[new_email_clean] = {
+                    "password": hash_password(new_password),
+                    "role": new_role,
+                    "active": True,
+                    "created_at": datetime.now().isoformat()
+                }
             if not is_valid_email(new_email_clean):
                 st.error("Email must be @little.africa format.")
             elif new_email_clean in users:
                 st.warning("This email is already registered.")
             elif len(new_password) < 6:
                 st.error("Password must be at least 6 characters.")
+            elif update_users(add_user) is False:
+                st.warning("This email is already registered.")
             else:
-                users[new_email_clean] = {
-                    "password": hash_password(new_password),
-                    "role": new_role,
-                    "active": True,
-                    "created_at": datetime.now().isoformat()
-                }
-                save_users(users)
                 st.success(f"✅ {new_email_clean} added successfully!")
                 st.rerun()
     with col_rev:
@@ -198,39 +205,107 @@ def show_admin_panel():
             target = st.selectbox("Select user", other_users, key="manage_target")
             target_info = users[target]
             is_active = target_info.get("active", True)
+
+            # Edits re-apply to the latest stored users; False if the user
+            # was deleted meanwhile by another admin.
+            def edit_target(**changes) -> bool:
+                def apply(latest):
+                    if target not in latest:
+                        return False
+                    latest[target].update(changes)
+                return update_users(apply) is not False
+
             c1, c2, c3 = st.columns(3)
             with c1:
                 if is_active:
                     if st.button("🚫 Revoke Access", key="revoke_btn"):
-                        users[target]["active"] = False
-                        save_users(users)
-                        st.success(f"Access revoked for {target}.")
-                        st.rerun()
+                        if edit_target(active=False):
+                            st.success(f"Access revoked for {target}.")
+                            st.rerun()
+                        st.warning(f"{target} no longer exists.")
                 else:
                     if st.button("✅ Restore Access", key="restore_btn"):
-                        users[target]["active"] = True
-                        save_users(users)
-                        st.success(f"Access restored for {target}.")
-                        st.rerun()
+                        if edit_target(active=True):
+                            st.success(f"Access restored for {target}.")
+                            st.rerun()
+                        st.warning(f"{target} no longer exists.")
             with c2:
                 new_pw = st.text_input("Reset password", type="password", key="reset_pw")
                 if st.button("🔑 Reset Password", key="reset_btn"):
                     if len(new_pw) < 6:
                         st.error("Min 6 characters.")
-                    else:
-                        users[target]["password"] = hash_password(new_pw)
-                        save_users(users)
+                    elif edit_target(password=hash_password(new_pw)):
                         st.success(f"Password reset for {target}.")
                         st.rerun()
+                    else:
+                        st.warning(f"{target} no longer exists.")
             with c3:
                 st.write(""); st.write("")
                 if st.button("🗑️ Delete User", key="delete_btn"):
-                    del users[target]
-                    save_users(users)
+                    update_users(lambda latest: latest.pop(target, None))
                     st.success(f"{target} deleted.")
                     st.rerun()
     st.markdown("---")
 
+@st.cache_resource
+def get_response_cache() -> bot_cache.ResponseCache:
+    return bot_cache.ResponseCache()
+
+def show_bot_cache_panel():
+    st.write("## 🤖 Retention Bot – Response Cache")
+    cache = get_response_cache()
+    stats = cache.stats()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Hits", f"{stats['hits']:,}")
+    c2.metric("Misses", f"{stats['misses']:,}")
+    c3.metric("Hit Rate", f"{stats['hit_rate']:.1f}%")
+    c4.metric("Cached Answers", f"{stats['entries']:,}")
+    for url, m in bot_client.all_metrics().items():
+        st.caption(
+            f"`{url}` — {m['requests']} recent requests, {m['errors']} failed, "
+            f"{m['retries']} retries, {m['in_flight']} in flight · "
+            f"latency p50 {m['latency_p50']:.2f}s / p95 {m['latency_p95']:.2f}s · "
+            f"first byte p50 {m['ttfb_p50']:.2f}s"
+        )
+    if st.button("🗑️ Clear Response Cache", key="clear_bot_cache"):
+        cache.clear()
+        st.success("Response cache cleared.")
+        st.rerun()
+
+def show_perf_panel():
+    st.write("## ⏱️ Performance – Stage Timings")
+    rows = perf.TIMER.summary()
+    if not rows:
+        st.info("No timings recorded yet.")
+        return
+    st.caption(f"Last {perf.TIMER.max_samples} samples per stage, across all sessions in this process.")
+    st.dataframe(pd.DataFrame(rows).round(2), use_container_width=True, hide_index=True)
+    c1, c2 = st.columns(2)
+    with c1:
+        st.download_button("⬇️ Download samples (JSON lines)", data=perf.TIMER.to_jsonl,
+                           file_name="stage_timings.jsonl", mime="application/x-ndjson",
+                           on_click="ignore", key="perf_download")
+    with c2:
+        if st.button("🗑️ Reset Timings", key="clear_perf"):
+            perf.TIMER.clear()
+            st.rerun()
+
+# Bytes held by the model's frames and by this filter state's copies, in the
+# compact layout (data_store.py) against the plain one. Computed once per
+# report id: measuring plain sizes means expanding every frame.
+@st.cache_resource(max_entries=32)
+def load_memory_report(report_id: tuple, _frames: dict) -> pd.DataFrame:
+    return data_store.memory_report(_frames)
+
+def show_memory_panel(report_id: tuple, frames: dict):
+    st.write("## 🧠 Memory – Frame Sizes")
+    report = load_memory_report(report_id, frames)
+    before, after = report["Before (bytes)"].sum(), report["After (bytes)"].sum()
+    st.caption(f"{before / 1e6:,.2f} MB as plain strings/float64 → {after / 1e6:,.2f} MB held "
+               f"({(1 - after / before) * 100 if before else 0:.1f}% less). Unfiltered views share "
+               "the model's frames; filtered ones are copies per filter state.")
+    st.dataframe(report, use_container_width=True, hide_index=True)
+
 # ─────────────────────────────────────────────
 # AUTH GATE
 # ─────────────────────────────────────────────
@@ -243,27 +318,59 @@ if not st.session_state["authenticated"]:
 # ─────────────────────────────────────────────
 # LOAD DATA
 # ─────────────────────────────────────────────
-@st.cache_data
-def load_data():
+# The workbook is parsed and normalized once into a Parquet cache (see
+# data_store.py) and then owned by a process-wide watcher (live_data.py):
+# when data.xlsx changes, only the changed sheets are re-read and the new
+# version — with its filter index and cube — is published atomically. Each
+# rerun reads the current snapshot once, so every section below sees one
+# consistent version, and open sessions switch over on their next rerun
+# without a cold load. Frames are shared, never mutated in place.
+@st.cache_resource
+def get_live_data() -> live_data.LiveData:
+    return live_data.LiveData(data_store.DATA_FILE).start()
+
+def load_data(version: str) -> data_store.DataModel:
+    return get_live_data().snapshot(version).model
+
+def get_secret(name: str, default: str = "") -> str:
     try:
-        target_df         = pd.read_excel("data.xlsx", sheet_name="Target")
-        data_2025_df      = pd.read_excel("data.xlsx", sheet_name="2025")
-        data_2026_df      = pd.read_excel("data.xlsx", sheet_name="2026")
-        data_2026_week_df = pd.read_excel("data.xlsx", sheet_name="2026_week_data")
-        return target_df, data_2025_df, data_2026_df, data_2026_week_df
-    except Exception as e:
-        st.error(f"Error loading data: {str(e)}")
-        return None, None, None, None
-
-target_df, data_2025_df, data_2026_df, data_2026_week_df = load_data()
-if target_df is None:
+        return str(st.secrets[name]).strip()
+    except Exception:
+        return default
+
+# Optional (DATA_BACKEND = "sqlite" in secrets): the filters, the comparison
+# frame, KPI totals, chart aggregates and churn lists are queried from an
+# embedded database file written once per data version (sql_store.py)
+# instead of computed in pandas; the other sections still read the model.
+SQL_BACKEND = get_secret("DATA_BACKEND").lower() == "sqlite"
+
+# Optional (PERF_LOG = "<path>" in secrets): also append every stage timing to
+# a JSON-lines file for offline analysis. Set before the first stage
+# below so a rerun is logged in full.
+perf.TIMER.log_path = get_secret("PERF_LOG") or None
+
+@st.cache_resource(max_entries=live_data.KEEP)
+def get_sql_store(version: str) -> sql_store.SqlStore:
+    return sql_store.open_store(load_data(version))
+
+try:
+    with perf.stage("data load"):
+        snapshot = get_live_data().current()
+except Exception as e:
+    st.error(f"Error loading data: {str(e)}")
     st.stop()
+data_version = snapshot.version
+model        = snapshot.model
+target_df  = model.sheets["Target"]
+current_df = model.sheets[model.years[-1]]
 
 # ─────────────────────────────────────────────
 # CONSTANTS
 # ─────────────────────────────────────────────
-MONTH_COLS = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
-WEEK_COLS  = [f"week {i}" for i in range(1, 21)]
+# Years and weeks come from the workbook (data_store.DataModel): the latest
+# year sheet is the current year, and every week column it has is used.
+MONTH_COLS   = data_store.MONTH_COLS
+CURRENT_YEAR = model.years[-1]
 
 current_user = st.session_state["current_user"]
 current_role = st.session_state["current_role"]
@@ -304,13 +411,22 @@ with st.sidebar:
         key="sb_assignee"
     )
 
-    available_months_2026 = [m for m in MONTH_COLS if m in data_2026_df.columns]
+    available_months = [m for m in MONTH_COLS if m in current_df.columns]
     month_filter = st.selectbox(
-        "Month (2026)",
-        ["All"] + available_months_2026,
+        f"Month ({CURRENT_YEAR})",
+        ["All"] + available_months,
         key="sb_month"
     )
 
+    # Any earlier year can be the comparison year; the one before is the default.
+    compare_years = model.years[-2::-1]
+    if len(compare_years) > 1:
+        compare_year = st.selectbox("Compare with", compare_years, key="sb_compare_year")
+    else:
+        compare_year = compare_years[0]
+    years = (compare_year, CURRENT_YEAR)
+    prev_year, cur_year = years
+
     st.markdown("---")
     st.markdown("### 🔴 Churn Filter")
     churn_period = st.selectbox(
@@ -325,78 +441,183 @@ with st.sidebar:
 if current_role == "admin":
     with st.expander("🔐 Admin Panel – User Management", expanded=False):
         show_admin_panel()
+    with st.expander("🤖 Retention Bot – Response Cache", expanded=False):
+        show_bot_cache_panel()
+    with st.expander("⏱️ Performance – Stage Timings", expanded=False):
+        show_perf_panel()
+    memory_panel = st.expander("🧠 Memory – Frame Sizes", expanded=False)   # filled once the filters apply
+    with st.expander("🧹 Data Quality – Coerced Cells", expanded=False):
+        live = get_live_data()
+        st.caption(f"Data version `{data_version[:12]}` · published "
+                   f"{datetime.fromtimestamp(snapshot.loaded_at):%Y-%m-%d %H:%M:%S} · "
+                   f"{live_data.describe_deltas(snapshot.deltas)}")
+        if live.last_error:
+            st.warning(f"Last reload of data.xlsx failed; still serving this version. {live.last_error}")
+        if model.report.empty:
+            st.success("All month/week cells were numeric and every row has a Corporates key.")
+        else:
+            st.dataframe(model.report, use_container_width=True, hide_index=True)
 
 # ─────────────────────────────────────────────
 # APPLY FILTERS
 # ─────────────────────────────────────────────
 # Filter using the Target sheet as master reference for industry/assignee,
 # then propagate the matching Corporates list to all sheets.
-# This avoids dropping corporates that exist in 2026 but lack metadata rows.
-
-filtered_target    = target_df.copy()
-filtered_2025      = data_2025_df.copy()
-filtered_2026      = data_2026_df.copy()
-filtered_2026_week = data_2026_week_df.copy()
-
-if corporate != "All":
-    filtered_target    = filtered_target[filtered_target["Corporates"] == corporate]
-    filtered_2025      = filtered_2025[filtered_2025["Corporates"] == corporate]
-    filtered_2026      = filtered_2026[filtered_2026["Corporates"] == corporate]
-    filtered_2026_week = filtered_2026_week[filtered_2026_week["Corporates"] == corporate]
-
-if industry != "All":
-    corps_in_industry  = target_df[target_df["industry_"] == industry]["Corporates"].unique()
-    filtered_target    = filtered_target[filtered_target["Corporates"].isin(corps_in_industry)]
-    filtered_2025      = filtered_2025[filtered_2025["Corporates"].isin(corps_in_industry)]
-    filtered_2026      = filtered_2026[filtered_2026["Corporates"].isin(corps_in_industry)]
-    filtered_2026_week = filtered_2026_week[filtered_2026_week["Corporates"].isin(corps_in_industry)]
-
-if assignee != "All":
-    corps_by_assignee  = target_df[target_df["Assignee_"] == assignee]["Corporates"].unique()
-    filtered_target    = filtered_target[filtered_target["Corporates"].isin(corps_by_assignee)]
-    filtered_2025      = filtered_2025[filtered_2025["Corporates"].isin(corps_by_assignee)]
-    filtered_2026      = filtered_2026[filtered_2026["Corporates"].isin(corps_by_assignee)]
-    filtered_2026_week = filtered_2026_week[filtered_2026_week["Corporates"].isin(corps_by_assignee)]
-
-months_2026 = available_months_2026 if month_filter == "All" else [month_filter]
-
-if filtered_2026.empty:
-    st.warning("No 2026 data available for the selected filters.")
+# This avoids dropping corporates that exist in the current year but lack metadata rows.
+# Positions come from an index built once per data version (engine.py), so a
+# filter combination costs an array intersection plus one take() per sheet;
+# with no filters the shared frames are used directly (never mutated).
+def load_filter_index(version: str) -> dict:
+    return get_live_data().snapshot(version).index
+
+# On the SQL backend the aggregates are queries, so a filtered view fetches
+# only the week sheet's rows — the one sheet listed further down (weekly
+# table, charts) — in the model's dtypes.
+@st.cache_resource(max_entries=128)
+def load_filtered(version: str, corporate: str, industry: str, assignee: str) -> dict:
+    if SQL_BACKEND and (corporate, industry, assignee) != ("All", "All", "All"):
+        week_sheet = load_data(version).week_sheet
+        return get_sql_store(version).apply_filters(corporate, industry, assignee,
+                                                    {week_sheet: load_data(version).sheets[week_sheet]})
+    return engine.apply_filters(load_data(version).sheets, load_filter_index(version),
+                                corporate, industry, assignee)
+
+# KPI totals, the monthly series and the assignee/industry/attainment
+# aggregates are sliced from a cube built once per data version (engine.py),
+# so their cost doesn't grow with the number of corporates. The snapshot's
+# cube covers the default year pair; another comparison year gets its own.
+@st.cache_resource(max_entries=live_data.KEEP)
+def build_year_cube(version: str, years: tuple) -> dict:
+    return engine.build_cube(load_data(version).sheets, MONTH_COLS, years)
+
+def load_cube(version: str, years: tuple) -> dict:
+    cube = get_live_data().snapshot(version).cube
+    return cube if cube["years"] == years else build_year_cube(version, years)
+
+# Everything derived from a filter combination (merged comparison frame, KPI
+# totals, chart aggregates) comes from one pure function
+# (engine.aggregate_dashboard), shared across sessions in a bounded cache
+# keyed on (data version, years, corporate, industry, assignee, month).
+@st.cache_resource(max_entries=128)
+def load_dashboard(version: str, years: tuple, corporate: str, industry: str, assignee: str,
+                   month: str) -> dict:
+    if SQL_BACKEND:
+        return get_sql_store(version).compute_dashboard(
+            corporate, industry, assignee, month, MONTH_COLS, years,
+            load_filtered(version, corporate, industry, assignee))
+    return engine.aggregate_dashboard(
+        load_data(version).sheets, load_filtered(version, corporate, industry, assignee), month, MONTH_COLS,
+        engine.slice_cube(load_cube(version, years), corporate, industry, assignee, month), years)
+
+with perf.stage("filters"):
+    load_filtered(data_version, corporate, industry, assignee)
+with perf.stage("aggregation"):
+    dash = load_dashboard(data_version, years, corporate, industry, assignee, month_filter)
+filtered_week = dash["filtered"][model.week_sheet]
+
+if current_role == "admin":
+    with memory_panel:
+        show_memory_panel(
+            (data_version, years, corporate, industry, assignee, month_filter),
+            {**model.sheets,
+             **{f"{s} (filtered)": df for s, df in dash["filtered"].items()},
+             "merged": dash["merged"]})
+
+if not dash["active_corps"]:
+    st.warning(f"No {cur_year} data available for the selected filters.")
     st.stop()
 
 # ─────────────────────────────────────────────
 # CHURN HELPER
 # ─────────────────────────────────────────────
+# All churn windows are computed together with joins/isin (engine.py) and
+# cached per data version: churn never depends on the sidebar filters, so
+# filter changes and chat reruns reuse these frames untouched.
+@st.cache_resource(max_entries=live_data.KEEP)
+def load_churn(version: str, years: tuple) -> dict:
+    m = load_data(version)
+    if SQL_BACKEND:
+        frame = get_sql_store(version).build_churn_frame(MONTH_COLS, m.week_sheet, m.week_cols, years)
+    else:
+        frame = engine.build_churn_frame(
+            m.sheets["Target"], m.sheets[years[0]], m.sheets[years[1]], m.sheets[m.week_sheet],
+            MONTH_COLS, m.week_cols, years)
+    churn = {days: engine.churned_for_period(frame, days) for days in engine.CHURN_WINDOWS}
+    churn["global"] = engine.churned_global(frame)
+    return churn
+
 def get_churned_by_period(days: int) -> pd.DataFrame:
-    weeks_threshold = max(1, min(days // 7, len(WEEK_COLS)))
-    recent_cols = WEEK_COLS[-weeks_threshold:]
-    not_in_2026 = set(data_2025_df["Corporates"]) - set(data_2026_df["Corporates"])
-    zero_recent = set()
-    if not data_2026_week_df.empty:
-        wk = data_2026_week_df.copy()
-        existing = [c for c in recent_cols if c in wk.columns]
-        if existing:
-            for c in existing:
-                wk[c] = pd.to_numeric(wk[c], errors="coerce").fillna(0)
-            wk["recent_total"] = wk[existing].sum(axis=1)
-            zero_recent = set(wk[wk["recent_total"] == 0]["Corporates"])
-    churned = not_in_2026 | zero_recent
-    result = []
-    for corp in churned:
-        r25 = data_2025_df[data_2025_df["Corporates"] == corp]
-        rt  = target_df[target_df["Corporates"] == corp]
-        if not r25.empty:
-            r25r = r25.iloc[0]
-            rtr  = rt.iloc[0] if not rt.empty else None
-            result.append({
-                "Corporate":    corp,
-                "Industry":     r25r.get("industry_", "—"),
-                "Assignee":     r25r.get("Assignee_", "—"),
-                "2025 Total":   float(r25r[[m for m in MONTH_COLS if m in r25r.index]].apply(pd.to_numeric, errors="coerce").fillna(0).sum()),
-                "Target":       float(rtr[[m for m in MONTH_COLS if m in rtr.index]].apply(pd.to_numeric, errors="coerce").fillna(0).sum()) if rtr is not None else 0,
-                "Churn Period": f"{days} days"
-            })
-    return pd.DataFrame(result)
+    with perf.stage("churn"):
+        return load_churn(data_version, years)[days]
+
+# ─────────────────────────────────────────────
+# PAGED TABLES
+# ─────────────────────────────────────────────
+# Tables are searched, sorted and sliced server-side (tables.py) so only the
+# visible page and columns reach the browser. A table's row order is cached
+# on its identity — data version plus the filter state it came from — so
+# paging through it doesn't re-sort. The full table downloads as CSV, Parquet
+# or XLSX: written in chunks to a file under the data version's cache
+# directory (tables.py EXPORT) on first request, then served from that file.
+# Each directory keeps its newest tables.EXPORT_KEEP files, and goes with the
+# version's cache directory once live_data drops that version.
+EXPORT_DIR = "exports"
+
+@st.cache_resource(max_entries=256)
+def table_order(table_id: tuple, search: str, sort_col: str, ascending: bool, _df: pd.DataFrame):
+    return tables.row_order(_df, search, sort_col, ascending)
+
+def show_paged_table(key: str, df: pd.DataFrame, table_id: tuple, sort_col: str,
+                     ascending: bool = False, labels: dict = None, formats: dict = None,
+                     file_name: str = "table"):
+    labels   = labels or {}
+    all_cols = list(df.columns)
+    label    = lambda col: labels.get(col, col)
+
+    c1, c2, c3, c4, c5 = st.columns([3, 2, 1, 1, 1])
+    with c1:
+        search = st.text_input("Search", key=f"{key}_search", placeholder="Corporate, industry, assignee…")
+    with c2:
+        sort_col = st.selectbox("Sort by", all_cols, index=all_cols.index(sort_col),
+                                format_func=label, key=f"{key}_sort")
+    with c3:
+        order_by = st.selectbox("Order", ["Descending", "Ascending"],
+                                index=0 if not ascending else 1, key=f"{key}_order")
+    with c4:
+        page_size = st.selectbox("Rows", tables.PAGE_SIZES, key=f"{key}_size")
+
+    with perf.stage(f"table: {key}"):
+        order = table_order(table_id, search, sort_col, order_by == "Ascending", df)
+        pages = tables.page_count(len(order), page_size)
+        page_key, sig_key = f"{key}_page", f"{key}_sig"
+        signature = (table_id, search, sort_col, order_by, page_size)
+        if st.session_state.get(sig_key) != signature or st.session_state.get(page_key, 1) > pages:
+            st.session_state[page_key] = 1
+            st.session_state[sig_key]  = signature
+        with c5:
+            page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+
+        with st.popover("Columns"):
+            hidden = st.multiselect("Hide columns", all_cols, format_func=label, key=f"{key}_hidden")
+
+        start = (page - 1) * page_size
+        st.caption(f"Rows {min(start + 1, len(order))}–{min(start + page_size, len(order))} "
+                   f"of {len(order)} · page {page} of {pages}")
+        st.dataframe(tables.page_frame(df, order, page, page_size, [c for c in all_cols if c not in hidden],
+                                       labels, formats),
+                     use_container_width=True, hide_index=True)
+        d1, d2 = st.columns([1, 4])
+        with d1:
+            fmt = st.selectbox("Export format", list(tables.EXPORT_FORMATS), key=f"{key}_format",
+                               label_visibility="collapsed")
+        ext, mime  = tables.EXPORT_FORMATS[fmt]
+        folder     = os.path.join(data_store.cache_dir(data_version), EXPORT_DIR)
+        export_key = (table_id, search, sort_col, order_by)
+        with d2:
+            st.download_button(f"⬇️ Download all {len(order)} rows ({fmt})",
+                               data=lambda: tables.read_file(
+                                   tables.export_file(folder, export_key, df, order, fmt, labels)),
+                               file_name=file_name + ext, mime=mime, on_click="ignore", key=f"{key}_download")
 
 # ─────────────────────────────────────────────
 # PAGE TITLE
@@ -415,75 +636,24 @@ if churn_period != "None":
         st.success("No churned corporates found for this period.")
     else:
         st.info(f"Found **{len(churned_df_period)}** corporates inactive in the last {days} days.")
-        st.dataframe(churned_df_period.sort_values("2025 Total", ascending=False),
-                     use_container_width=True, hide_index=True)
+        show_paged_table("churn_period", churned_df_period, (data_version, "churn", years, days),
+                         sort_col=f"{prev_year} Total", file_name=f"churned_{days}d")
     st.markdown("---")
 
 # ─────────────────────────────────────────────
-# AGGREGATION  ←  THE CORE FIX
-#
-# PROBLEM: Old code intersected corporates across all 3 sheets, so any
-# corporate missing from even one sheet was silently dropped — causing
-# totals to be lower than the Excel sheet totals.
-#
-# FIX: Sum each sheet independently, then outer-join the results.
-# Every corporate from every sheet is preserved; missing values → 0.
-# KPI totals come directly from the filtered sheet sums, not from any join.
-# ─────────────────────────────────────────────
-
-def sum_months(df: pd.DataFrame, month_cols: list, label: str) -> pd.DataFrame:
-    """Return a Corporates + label dataframe with numeric month sums."""
-    cols = [m for m in month_cols if m in df.columns]
-    tmp  = df[["Corporates"] + cols].copy()
-    for c in cols:
-        tmp[c] = pd.to_numeric(tmp[c], errors="coerce").fillna(0)
-    tmp[label] = tmp[cols].sum(axis=1)
-    return tmp[["Corporates", label]]
-
-totals_2026   = sum_months(filtered_2026,   months_2026, "2026")
-totals_2025   = sum_months(filtered_2025,   months_2026, "2025")
-totals_target = sum_months(filtered_target, months_2026, "Target")
-
-# Outer-join — no corporates dropped
-merged = (
-    totals_2026
-    .merge(totals_2025,   on="Corporates", how="outer")
-    .merge(totals_target, on="Corporates", how="outer")
-    .fillna(0)
-)
-
-# Attach industry / assignee metadata (target sheet is master; 2025 as fallback)
-meta = (
-    target_df[["Corporates","industry_","Assignee_"]]
-    .drop_duplicates("Corporates")
-)
-meta_2025 = (
-    data_2025_df[["Corporates","industry_","Assignee_"]]
-    .drop_duplicates("Corporates")
-    .rename(columns={"industry_":"ind_2025","Assignee_":"asn_2025"})
-)
-merged = merged.merge(meta, on="Corporates", how="left")
-merged = merged.merge(meta_2025, on="Corporates", how="left")
-merged["industry_"] = merged["industry_"].fillna(merged["ind_2025"]).fillna("—")
-merged["Assignee_"] = merged["Assignee_"].fillna(merged["asn_2025"]).fillna("—")
-merged = merged.drop(columns=["ind_2025","asn_2025"])
-
-merged["% vs 2025"]   = merged.apply(
-    lambda r: round((r["2026"]-r["2025"])/r["2025"]*100, 1) if r["2025"] != 0 else 0.0, axis=1)
-merged["% vs Target"] = merged.apply(
-    lambda r: round((r["2026"]-r["Target"])/r["Target"]*100, 1) if r["Target"] != 0 else 0.0, axis=1)
-
-# ── KPI TOTALS: sum directly from each filtered sheet — no join filtering ──
-total_2026   = totals_2026["2026"].sum()
-total_2025   = totals_2025["2025"].sum()
-total_target = totals_target["Target"].sum()
-shortfall    = total_target - total_2026
-
-active_corps   = filtered_2026["Corporates"].nunique()
-churned_30     = get_churned_by_period(30)
-num_churned_30 = len(churned_30)
-growth_vs_target = round((total_2026-total_target)/total_target*100, 1) if total_target != 0 else 0.0
-growth_vs_2025   = round((total_2026-total_2025)  /total_2025  *100, 1) if total_2025   != 0 else 0.0
+# AGGREGATION  (see engine.compute_dashboard — each sheet is summed
+# independently and outer-joined, so no corporate is dropped)
+# ─────────────────────────────────────────────
+merged             = dash["merged"]
+total_current      = dash["total_current"]
+total_previous     = dash["total_previous"]
+total_target       = dash["total_target"]
+shortfall          = dash["shortfall"]
+active_corps       = dash["active_corps"]
+growth_vs_target   = dash["growth_vs_target"]
+growth_vs_previous = dash["growth_vs_previous"]
+churned_30         = get_churned_by_period(30)
+num_churned_30     = len(churned_30)
 
 # ─────────────────────────────────────────────
 # KPI CARDS
@@ -506,14 +676,14 @@ st.markdown("""
 
 r1c1, r1c2, r1c3, r1c4 = st.columns(4)
 with r1c1:
-    st.markdown(f'<div class="kpi-card kpi-red"><div class="kpi-label">🎯 Total Target (2026)</div>'
+    st.markdown(f'<div class="kpi-card kpi-red"><div class="kpi-label">🎯 Total Target ({cur_year})</div>'
                 f'<div class="kpi-value">{total_target:,.0f}</div></div>', unsafe_allow_html=True)
 with r1c2:
-    st.markdown(f'<div class="kpi-card kpi-blue"><div class="kpi-label">📅 Total 2025</div>'
-                f'<div class="kpi-value">{total_2025:,.0f}</div></div>', unsafe_allow_html=True)
+    st.markdown(f'<div class="kpi-card kpi-blue"><div class="kpi-label">📅 Total {prev_year}</div>'
+                f'<div class="kpi-value">{total_previous:,.0f}</div></div>', unsafe_allow_html=True)
 with r1c3:
-    st.markdown(f'<div class="kpi-card kpi-yellow"><div class="kpi-label">📅 Total 2026</div>'
-                f'<div class="kpi-value">{total_2026:,.0f}</div></div>', unsafe_allow_html=True)
+    st.markdown(f'<div class="kpi-card kpi-yellow"><div class="kpi-label">📅 Total {cur_year}</div>'
+                f'<div class="kpi-value">{total_current:,.0f}</div></div>', unsafe_allow_html=True)
 with r1c4:
     sf_cls = "kpi-orange" if shortfall > 0 else "kpi-green"
     sf_lbl = "⚠️ Shortfall to Target" if shortfall > 0 else "✅ Surplus vs Target"
@@ -527,12 +697,12 @@ with r2c1:
     st.markdown(f'<div class="kpi-card {gt_cls}"><div class="kpi-label">📈 Growth Rate vs Target</div>'
                 f'<div class="kpi-value">{gt_arr} {abs(growth_vs_target):.1f}%</div></div>', unsafe_allow_html=True)
 with r2c2:
-    g25_cls = "kpi-green" if growth_vs_2025 >= 0 else "kpi-orange"
-    g25_arr = "▲" if growth_vs_2025 >= 0 else "▼"
-    st.markdown(f'<div class="kpi-card {g25_cls}"><div class="kpi-label">📈 Growth Rate vs 2025</div>'
-                f'<div class="kpi-value">{g25_arr} {abs(growth_vs_2025):.1f}%</div></div>', unsafe_allow_html=True)
+    gp_cls = "kpi-green" if growth_vs_previous >= 0 else "kpi-orange"
+    gp_arr = "▲" if growth_vs_previous >= 0 else "▼"
+    st.markdown(f'<div class="kpi-card {gp_cls}"><div class="kpi-label">📈 Growth Rate vs {prev_year}</div>'
+                f'<div class="kpi-value">{gp_arr} {abs(growth_vs_previous):.1f}%</div></div>', unsafe_allow_html=True)
 with r2c3:
-    st.markdown(f'<div class="kpi-card kpi-teal"><div class="kpi-label">✅ Active Corporates (2026)</div>'
+    st.markdown(f'<div class="kpi-card kpi-teal"><div class="kpi-label">✅ Active Corporates ({cur_year})</div>'
                 f'<div class="kpi-value">{active_corps}</div></div>', unsafe_allow_html=True)
 with r2c4:
     ch_cls = "kpi-pink" if num_churned_30 > 0 else "kpi-green"
@@ -544,22 +714,15 @@ st.markdown("<br>", unsafe_allow_html=True)
 # ─────────────────────────────────────────────
 # COMPARISON TABLE
 # ─────────────────────────────────────────────
-def fmt_pct(val):
-    if val > 0:   return f"+{val:.1f}% 😍"
-    elif val < 0: return f"{val:.1f}% 🤬"
-    else:         return f"0.0% 😐"
-
-display_df = merged.copy()
-display_df["% vs 2025"]   = display_df["% vs 2025"].apply(fmt_pct)
-display_df["% vs Target"] = display_df["% vs Target"].apply(fmt_pct)
-
-st.header("📋 Comparison Table (2026 vs 2025 vs Target)")
-st.dataframe(
-    display_df
-    .rename(columns={"Corporates":"Corporate","industry_":"Industry","Assignee_":"Assignee"})
-    [["Corporate","Industry","Assignee","Target","2025","2026","% vs 2025","% vs Target"]]
-    .sort_values("2026", ascending=False),
-    use_container_width=True, hide_index=True
+st.header(f"📋 Comparison Table ({cur_year} vs {prev_year} vs Target)")
+show_paged_table(
+    "comparison",
+    merged[["Corporates","industry_","Assignee_","Target",prev_year,cur_year,f"% vs {prev_year}","% vs Target"]],
+    (data_version, "comparison", years, corporate, industry, assignee, month_filter),
+    sort_col=cur_year,
+    labels={"Corporates":"Corporate","industry_":"Industry","Assignee_":"Assignee"},
+    formats={f"% vs {prev_year}": engine.fmt_pct, "% vs Target": engine.fmt_pct},
+    file_name="comparison",
 )
 
 # ─────────────────────────────────────────────
@@ -567,193 +730,95 @@ st.dataframe(
 # ─────────────────────────────────────────────
 st.header("📈 Performance Charts")
 
-# Monthly aggregation — sum directly from each filtered sheet, per month
-monthly_rows = []
-for m in months_2026:
-    def col_sum(df, col):
-        if col not in df.columns:
-            return 0.0
-        return pd.to_numeric(df[col], errors="coerce").fillna(0).sum()
-    monthly_rows.append({
-        "Month":  m,
-        "Target": col_sum(filtered_target, m),
-        "2025":   col_sum(filtered_2025,   m),
-        "2026":   col_sum(filtered_2026,   m),
-    })
-monthly_chart_df = pd.DataFrame(monthly_rows)
+# Figures are built by charts.py and cached per (data version, filter state),
+# so reruns that leave the filters alone (chat, trend controls) re-send the
+# cached Figure objects instead of rebuilding them.
+@st.cache_resource(max_entries=128)
+def load_figures(version: str, years: tuple, corporate: str, industry: str, assignee: str,
+                 month: str) -> dict:
+    m = load_data(version)
+    return charts.build_figures(load_dashboard(version, years, corporate, industry, assignee, month),
+                                corporate, m.week_sheet, m.week_cols)
+
+with perf.stage("charts build"):
+    figures = load_figures(data_version, years, corporate, industry, assignee, month_filter)
+
+def show_chart(name: str):
+    with perf.stage(f"chart: {name}"):
+        st.plotly_chart(figures[name], use_container_width=True)
 
 col_c1, col_c2 = st.columns(2)
 with col_c1:
-    fig_line = go.Figure()
-    clr = {"Target":"#FF0000","2025":"#0000FF","2026":"#00C853"}
-    for metric in ["Target","2025","2026"]:
-        fig_line.add_trace(go.Scatter(
-            x=monthly_chart_df["Month"], y=monthly_chart_df[metric], name=metric,
-            mode="lines+markers+text",
-            text=monthly_chart_df[metric].round(0).astype(int).astype(str),
-            textposition="top center",
-            line=dict(width=2, color=clr[metric]), marker=dict(size=8)
-        ))
-    fig_line.update_layout(
-        title="Monthly Performance: 2026 vs 2025 vs Target",
-        xaxis_title="Month", yaxis_title="Revenue",
-        template="plotly_white", height=400
-    )
-    st.plotly_chart(fig_line, use_container_width=True)
-
+    show_chart("monthly")
 with col_c2:
-    agg_asn = (
-        merged.groupby("Assignee_")["2026"].sum()
-        .reset_index().rename(columns={"Assignee_":"Assignee"})
-        .sort_values("2026", ascending=False)
-    )
-    fig_pie = px.pie(
-        agg_asn, names="Assignee", values="2026",
-        title="2026 Revenue Breakdown by Assignee",
-        color_discrete_sequence=px.colors.qualitative.Bold
-    )
-    fig_pie.update_layout(height=400)
-    st.plotly_chart(fig_pie, use_container_width=True)
+    show_chart("assignee")
 
 col_c3, col_c4 = st.columns(2)
 with col_c3:
-    agg_ind = (
-        merged.groupby("industry_")["2026"].sum()
-        .reset_index().rename(columns={"industry_":"Industry"})
-        .sort_values("2026", ascending=True)
-    )
-    fig_bar_ind = px.bar(
-        agg_ind, x="2026", y="Industry", orientation="h",
-        title="2026 Revenue by Industry",
-        color="2026", color_continuous_scale="Blues"
-    )
-    fig_bar_ind.update_layout(height=400, showlegend=False)
-    st.plotly_chart(fig_bar_ind, use_container_width=True)
-
+    show_chart("industry")
 with col_c4:
-    yoy_show = merged[["Corporates","% vs 2025","2026"]].copy()
-    top10 = yoy_show.nlargest(10, "% vs 2025")
-    bot10 = yoy_show.nsmallest(10, "% vs 2025")
-    yoy_combined = pd.concat([top10, bot10]).drop_duplicates().sort_values("% vs 2025", ascending=True)
-    fig_yoy = px.bar(
-        yoy_combined, x="% vs 2025", y="Corporates", orientation="h",
-        title="Top Growth & Biggest Declines vs 2025 (%)",
-        color="% vs 2025", color_continuous_scale="RdYlGn", color_continuous_midpoint=0
-    )
-    fig_yoy.update_layout(height=500, showlegend=False)
-    st.plotly_chart(fig_yoy, use_container_width=True)
+    show_chart("yoy")
 
 # Target attainment by assignee
 st.header("🎯 Target Attainment by Assignee")
-attain = (
-    merged.groupby("Assignee_")[["Target","2026"]].sum()
-    .reset_index().rename(columns={"Assignee_":"Assignee","2026":"Revenue 2026"})
-)
-attain["Attainment %"] = (attain["Revenue 2026"] / attain["Target"] * 100).replace([np.inf,-np.inf], 0).fillna(0).round(1)
-fig_attain = px.bar(
-    attain, x="Assignee", y="Attainment %",
-    title="Target Attainment % per Assignee (2026)",
-    color="Attainment %", color_continuous_scale="RdYlGn",
-    color_continuous_midpoint=100, text="Attainment %"
-)
-fig_attain.add_hline(y=100, line_dash="dash", line_color="red", annotation_text="Target = 100%")
-fig_attain.update_traces(texttemplate="%{text:.1f}%", textposition="outside")
-fig_attain.update_layout(height=400, showlegend=False)
-st.plotly_chart(fig_attain, use_container_width=True)
+show_chart("attainment")
 
 # ─────────────────────────────────────────────
 # WEEKLY TREND
 # ─────────────────────────────────────────────
-st.header("📅 2026 Weekly Trend per Corporate")
-if not filtered_2026_week.empty:
-    present_weeks = [w for w in WEEK_COLS if w in filtered_2026_week.columns]
-    for col in present_weeks:
-        filtered_2026_week[col] = pd.to_numeric(filtered_2026_week[col], errors="coerce").fillna(0)
-
-    if corporate != "All":
-        plot_df       = filtered_2026_week[filtered_2026_week["Corporates"] == corporate]
-        corps_to_plot = [corporate]
-    else:
-        total_rev     = filtered_2026_week[present_weeks].sum(axis=1)
-        top_idx       = total_rev.nlargest(5).index
-        plot_df       = filtered_2026_week.loc[top_idx]
-        corps_to_plot = plot_df["Corporates"].unique()
-
+# The weekly table (week columns plus the fitted trend) is cached per filter
+# state and trend window, like the figures. It covers every week column of
+# the current year's weekly sheet, however many there are.
+@st.cache_resource(max_entries=128)
+def load_week_table(version: str, corporate: str, industry: str, assignee: str,
+                    window) -> pd.DataFrame:
+    m       = load_data(version)
+    week_df = load_filtered(version, corporate, industry, assignee)[m.week_sheet]
+    return pd.concat([week_df, engine.trend_frame(week_df, m.week_cols, window)], axis=1)
+
+st.header(f"📅 {cur_year} Weekly Trend per Corporate")
+if not filtered_week.empty:
     col_w1, col_w2 = st.columns(2)
     with col_w1:
-        fig_weekly = go.Figure()
-        for corp in corps_to_plot:
-            crow = plot_df[plot_df["Corporates"] == corp]
-            if crow.empty:
-                continue
-            vals = [float(crow.iloc[0][w]) for w in present_weeks]
-            fig_weekly.add_trace(go.Scatter(
-                x=present_weeks, y=vals, mode="lines+markers", name=corp,
-                line=dict(width=2), marker=dict(size=6)
-            ))
-        fig_weekly.update_layout(
-            title="Weekly Revenue Trend (Top 5 or Selected)",
-            xaxis_title="Week", yaxis_title="Revenue",
-            template="plotly_white", height=400
-        )
-        st.plotly_chart(fig_weekly, use_container_width=True)
-
+        show_chart("weekly")
     with col_w2:
-        if len(present_weeks) >= 2:
-            heat_data = []
-            for corp in corps_to_plot:
-                crow = plot_df[plot_df["Corporates"] == corp]
-                if crow.empty:
-                    continue
-                vals = [float(crow.iloc[0][w]) for w in present_weeks]
-                heat_data.append([corp] + vals)
-            if heat_data:
-                heat_df = pd.DataFrame(heat_data, columns=["Corporate"] + present_weeks).set_index("Corporate")
-                fig_heat = px.imshow(heat_df, title="Weekly Revenue Heatmap",
-                                     color_continuous_scale="Blues", aspect="auto")
-                fig_heat.update_layout(height=400)
-                st.plotly_chart(fig_heat, use_container_width=True)
-
-    def calc_slope(row):
-        vals = [float(row.get(w, 0)) for w in present_weeks]
-        if len(vals) < 2:
-            return 0
-        slope, _ = np.polyfit(range(len(vals)), vals, 1)
-        return round(slope, 2)
-
-    filtered_2026_week["Trend Slope"] = filtered_2026_week.apply(calc_slope, axis=1)
-    st.dataframe(filtered_2026_week, use_container_width=True, hide_index=True)
+        if figures["heatmap"] is not None:
+            show_chart("heatmap")
+
+    tw1, tw2 = st.columns([1, 2])
+    with tw1:
+        trend_window = st.selectbox(
+            "Trend window",
+            ["All weeks"] + [f"Last {n} weeks" for n in engine.TREND_WINDOWS],
+            key="trend_window"
+        )
+    with tw2:
+        st.write("")
+        show_fit = st.checkbox("Show intercept and R²", key="trend_fit_cols")
+    window     = None if trend_window == "All weeks" else int(trend_window.split()[1])
+    with perf.stage("weekly trend"):
+        week_table = load_week_table(data_version, corporate, industry, assignee, window)
+    if not show_fit:
+        week_table = week_table.drop(columns=["Trend Intercept", "Trend R²"])
+    show_paged_table("weekly", week_table,
+                     (data_version, "weekly", corporate, industry, assignee, month_filter, window, show_fit),
+                     sort_col="Trend Slope", file_name="weekly_trend")
 
 # ─────────────────────────────────────────────
 # CHURNED CORPORATES (Global)
 # ─────────────────────────────────────────────
-churned_all    = set(data_2025_df["Corporates"]) - set(data_2026_df["Corporates"])
-churned_global = []
-for corp in churned_all:
-    rt  = target_df[target_df["Corporates"] == corp]
-    r25 = data_2025_df[data_2025_df["Corporates"] == corp]
-    if not r25.empty:
-        r25r = r25.iloc[0]
-        rtr  = rt.iloc[0] if not rt.empty else None
-        churned_global.append({
-            "Corporate":  corp,
-            "Industry":   r25r.get("industry_", "—"),
-            "Assignee":   r25r.get("Assignee_", "—"),
-            "2025 Total": float(r25r[[m for m in MONTH_COLS if m in r25r.index]].apply(pd.to_numeric, errors="coerce").fillna(0).sum()),
-            "Target":     float(rtr[[m for m in MONTH_COLS if m in rtr.index]].apply(pd.to_numeric, errors="coerce").fillna(0).sum()) if rtr is not None else 0,
-        })
-
-if churned_global:
-    churned_global_df = pd.DataFrame(churned_global)
-    st.header("❌ Churned Corporates (Active in 2025, Inactive in 2026)")
-    st.dataframe(churned_global_df.sort_values("2025 Total", ascending=False),
-                 use_container_width=True, hide_index=True)
+with perf.stage("churn"):
+    churned_global_df = load_churn(data_version, years)["global"]
+if not churned_global_df.empty:
+    st.header(f"❌ Churned Corporates (Active in {prev_year}, Inactive in {cur_year})")
+    show_paged_table("churn_global", churned_global_df, (data_version, "churn", years, "global"),
+                     sort_col=f"{prev_year} Total", file_name="churned_global")
 
 # ─────────────────────────────────────────────
 # SUMMARY NOTE
 # ─────────────────────────────────────────────
-if total_2026 >= total_target:
-    advice = "Great job 💥! 2026 performance has met or exceeded the target. Keep it up!"
+if total_current >= total_target:
+    advice = f"Great job 💥! {cur_year} performance has met or exceeded the target. Keep it up!"
 else:
     advice = (
         f"You need to do better 👎🏻. An additional **{shortfall:,.0f}** is needed to meet target.\n\n"
@@ -765,12 +830,12 @@ else:
 
 st.header("📝 Summary Note")
 st.markdown(f"""
-**Total Target (2026):** {total_target:,.0f} &nbsp;|&nbsp;
-**Total 2025:** {total_2025:,.0f} &nbsp;|&nbsp;
-**Total 2026:** {total_2026:,.0f} &nbsp;|&nbsp;
+**Total Target ({cur_year}):** {total_target:,.0f} &nbsp;|&nbsp;
+**Total {prev_year}:** {total_previous:,.0f} &nbsp;|&nbsp;
+**Total {cur_year}:** {total_current:,.0f} &nbsp;|&nbsp;
 **Shortfall:** {shortfall:,.0f}
 
-**Growth vs 2025:** {growth_vs_2025:+.1f}% &nbsp;|&nbsp;
+**Growth vs {prev_year}:** {growth_vs_previous:+.1f}% &nbsp;|&nbsp;
 **Growth vs Target:** {growth_vs_target:+.1f}%
 
 **Advice:**
@@ -786,71 +851,41 @@ st.markdown("Ask me anything about corporate retention, churn risk, growth oppor
 
 if "chat_history" not in st.session_state:
     st.session_state["chat_history"] = []
+if "bot_cancel" not in st.session_state:
+    st.session_state["bot_cancel"] = threading.Event()
+
+# The context is assembled from cached sections (engine.py): the churn, YoY
+# and weekly sections depend only on the workbook and are built once per data
+# version; totals and industry/assignee sections follow the filter state, so
+# follow-up questions on the same view reuse both.
+@st.cache_resource(max_entries=live_data.KEEP)
+def bot_data_sections(version: str, years: tuple) -> str:
+    m = load_data(version)
+    prev, cur = (m.sheets[y] for y in years)
+    return "\n".join([
+        engine.context_churn_section(prev, cur, years),
+        engine.context_yoy_section(m.sheets["Target"], prev, cur, MONTH_COLS, years),
+        engine.context_weekly_section(m.sheets["Target"], m.sheets[m.week_sheet], m.week_cols),
+    ])
+
+@st.cache_data(max_entries=256)
+def bot_filter_sections(version: str, years: tuple, filters: tuple, totals: tuple,
+                        _merged: pd.DataFrame) -> str:
+    # `years` and `filters` (with `version`) fully determine `_merged`, so it is not hashed.
+    return "\n".join([
+        engine.context_totals_section(*totals, years),
+        engine.context_group_section(_merged, "industry_", "Industry", years),
+        engine.context_group_section(_merged, "Assignee_", "Assignee", years),
+    ])
 
 def build_bot_context() -> str:
-    lines = []
-    active_set  = set(data_2026_df["Corporates"])
-    churned_set = set(data_2025_df["Corporates"]) - active_set
-    lines.append(f"Active corporates in 2026: {len(active_set)}")
-    lines.append(f"Churned (in 2025 but not 2026): {len(churned_set)}")
-    if churned_set:
-        lines.append("Churned list: " + ", ".join(sorted(churned_set)[:40]))
-
-    lines.append("\n=== YoY per corporate ===")
-    present_months_bot = [m for m in MONTH_COLS if m in data_2026_df.columns]
-    all_corps = set(data_2026_df["Corporates"]) | set(data_2025_df["Corporates"])
-    yoy_rows = []
-    for corp in all_corps:
-        r26 = data_2026_df[data_2026_df["Corporates"] == corp]
-        r25 = data_2025_df[data_2025_df["Corporates"] == corp]
-        v26 = float(r26.iloc[0][[m for m in present_months_bot if m in r26.columns]].apply(pd.to_numeric, errors="coerce").fillna(0).sum()) if not r26.empty else 0.0
-        v25 = float(r25.iloc[0][[m for m in present_months_bot if m in r25.columns]].apply(pd.to_numeric, errors="coerce").fillna(0).sum()) if not r25.empty else 0.0
-        pct = round((v26-v25)/v25*100, 1) if v25 != 0 else 0.0
-        rt  = target_df[target_df["Corporates"] == corp]
-        ind = rt["industry_"].values[0] if not rt.empty else "—"
-        asn = rt["Assignee_"].values[0] if not rt.empty else "—"
-        yoy_rows.append((corp, v25, v26, pct, ind, asn))
-    yoy_rows.sort(key=lambda x: x[3])
-    for corp, v25, v26, pct, ind, asn in yoy_rows:
-        lines.append(f"  {corp}: 2025={v25:,.0f}, 2026={v26:,.0f}, YoY={pct:+.1f}%, Industry={ind}, Assignee={asn}")
-
-    lines.append("\n=== Weekly data ===")
-    wk_df = data_2026_week_df.copy()
-    present_wk = [c for c in WEEK_COLS if c in wk_df.columns]
-    for c in present_wk:
-        wk_df[c] = pd.to_numeric(wk_df[c], errors="coerce").fillna(0)
-    if len(present_wk) >= 2:
-        fh = present_wk[:len(present_wk)//2]
-        sh = present_wk[len(present_wk)//2:]
-        wk_df["fh"] = wk_df[fh].sum(axis=1)
-        wk_df["sh"] = wk_df[sh].sum(axis=1)
-        wk_df["trend"] = wk_df.apply(lambda r: round((r["sh"]-r["fh"])/r["fh"]*100,1) if r["fh"]!=0 else 0, axis=1)
-        for _, row in wk_df.iterrows():
-            rt  = target_df[target_df["Corporates"]==row["Corporates"]]
-            asn = rt["Assignee_"].values[0] if not rt.empty else "—"
-            ind = rt["industry_"].values[0] if not rt.empty else "—"
-            wvals = ", ".join([f"{row.get(w,0):.0f}" for w in present_wk])
-            lines.append(f"  {row['Corporates']}: weeks=[{wvals}], trend={row['trend']:+.1f}%, Assignee={asn}, Industry={ind}")
-
-    lines.append(f"\n=== Totals ===")
-    lines.append(f"Total target: {total_target:,.0f}")
-    lines.append(f"Total 2026:   {total_2026:,.0f}")
-    lines.append(f"Total 2025:   {total_2025:,.0f}")
-    lines.append(f"Shortfall:    {shortfall:,.0f}")
-    lines.append(f"Growth vs target: {growth_vs_target:+.1f}%")
-    lines.append(f"Growth vs 2025:   {growth_vs_2025:+.1f}%")
-
-    lines.append("\n=== Industry performance ===")
-    for _, row in merged.groupby("industry_")[["2025","2026"]].sum().reset_index().iterrows():
-        p = round((row["2026"]-row["2025"])/row["2025"]*100,1) if row["2025"]!=0 else 0
-        lines.append(f"  {row['industry_']}: 2025={row['2025']:,.0f}, 2026={row['2026']:,.0f}, YoY={p:+.1f}%")
-
-    lines.append("\n=== Assignee performance ===")
-    for _, row in merged.groupby("Assignee_")[["2025","2026"]].sum().reset_index().iterrows():
-        p = round((row["2026"]-row["2025"])/row["2025"]*100,1) if row["2025"]!=0 else 0
-        lines.append(f"  {row['Assignee_']}: 2025={row['2025']:,.0f}, 2026={row['2026']:,.0f}, YoY={p:+.1f}%")
-
-    return "\n".join(lines)
+    totals = (total_target, total_current, total_previous, shortfall, growth_vs_target, growth_vs_previous)
+    with perf.stage("bot context"):
+        return "\n".join([
+            bot_data_sections(data_version, years),
+            bot_filter_sections(data_version, years, (corporate, industry, assignee, month_filter),
+                                totals, merged),
+        ])
 
 SYSTEM_PROMPT = """You are the Little Retention Intelligence Bot — an expert analyst for Little Africa's corporate taxi retention team.
 
@@ -864,67 +899,119 @@ Ground every answer in the data. If something is not in the data, say so clearly
 === END DATA ===
 """
 
-def chat_with_bot(user_message: str, history: list) -> str:
-    import urllib.request, urllib.error
+def get_api_key() -> str:
+    HARDCODED_API_KEY = ""  # ← paste sk-ant-... here if not using secrets
+    return get_secret("ANTHROPIC_API_KEY") or HARDCODED_API_KEY.strip()
 
-    api_key = ""
-    try:
-        api_key = str(st.secrets["ANTHROPIC_API_KEY"]).strip()
-    except Exception:
-        pass
+API_KEY_MISSING = (
+    "⚠️ **Bot not configured — API key missing.**\n\n"
+    "In Streamlit Cloud → your app → ⚙️ Settings → Secrets, add:\n"
+    "```\nANTHROPIC_API_KEY = \"sk-ant-...\"\n```"
+)
 
-    HARDCODED_API_KEY = ""  # ← paste sk-ant-... here if not using secrets
-    if not api_key:
-        api_key = HARDCODED_API_KEY.strip()
+def get_base_url() -> str:
+    # ANTHROPIC_BASE_URL can point at mock_messages_api.py for offline testing.
+    return get_secret("ANTHROPIC_BASE_URL") or bot_client.API_URL
 
-    if not api_key or not api_key.startswith("sk-"):
-        return (
-            "⚠️ **Bot not configured — API key missing.**\n\n"
-            "In Streamlit Cloud → your app → ⚙️ Settings → Secrets, add:\n"
-            "```\nANTHROPIC_API_KEY = \"sk-ant-...\"\n```"
-        )
+def call_messages_api(api_key: str, system: str, messages: list) -> tuple:
+    """Return (text, ok). Errors come back as a displayable message with ok=False."""
+    try:
+        with perf.stage("bot HTTP"):
+            return bot_client.complete(api_key, system, messages, get_base_url()), True
+    except bot_client.BotError as e:
+        return str(e), False
 
-    context  = build_bot_context()
-    system   = SYSTEM_PROMPT.format(context=context)
+def to_messages(user_message: str, history: list) -> list:
     messages = []
     for turn in history:
         messages.append({"role": "user",      "content": turn["user"]})
         messages.append({"role": "assistant", "content": turn["bot"]})
     messages.append({"role": "user", "content": user_message})
-
-    payload = json.dumps({
-        "model": "claude-sonnet-4-20250514",
-        "max_tokens": 1500,
-        "system": system,
-        "messages": messages
-    }).encode()
-
-    req = urllib.request.Request(
-        "https://api.anthropic.com/v1/messages",
-        data=payload,
-        headers={
-            "Content-Type":      "application/json",
-            "x-api-key":         api_key,
-            "anthropic-version": "2023-06-01"
-        },
-        method="POST"
-    )
+    return messages
+
+# Answers are cached on (context hash, question, history) in bot_cache.py;
+# answers from a previous data.xlsx are dropped once per new data version.
+@st.cache_resource
+def invalidate_stale_answers(version: str) -> int:
+    return get_response_cache().invalidate_other_versions(version)
+
+def chat_with_bot(user_message: str, history: list, cancel: threading.Event, *,
+                 api_key: str, base_url: str, context: str, version: str,
+                 cache: bot_cache.ResponseCache):
+    """Yield the answer as it streams in; cached answers arrive in one piece.
+
+    Runs on the bot worker pool, so everything it needs is passed in rather
+    than read from Streamlit.
+    """
+    key    = bot_cache.cache_key(context, user_message, history)
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
     try:
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            data = json.loads(resp.read())
-            return data["content"][0]["text"]
-    except urllib.error.HTTPError as e:
-        body = e.read().decode("utf-8", errors="ignore")
-        return f"⚠️ API error {e.code}: {body}"
-    except Exception as e:
-        return f"⚠️ Bot error: {e}"
+        with perf.stage("bot HTTP"):
+            for chunk in bot_client.stream(api_key, SYSTEM_PROMPT.format(context=context),
+                                           to_messages(user_message, history), base_url, cancel):
+                parts.append(chunk)
+                yield chunk
+    except bot_client.BotError as e:
+        yield ("\n\n" if parts else "") + str(e)
+        return
+    if not cancel.is_set():
+        cache.put(key, "".join(parts), version)
+
+@st.cache_resource
+def get_bot_pool() -> bot_worker.BotWorkerPool:
+    return bot_worker.BotWorkerPool()
+
+def ask_bot(question: str):
+    """Queue a question; the answer is filled in by the worker pool."""
+    turns = st.session_state["chat_history"]
+    turns.append({"user": question, "bot": None})
+    api_key = get_api_key()
+    if not api_key or not api_key.startswith("sk-"):
+        turns[-1]["bot"] = API_KEY_MISSING
+        return
+    invalidate_stale_answers(data_version)
+    answer = functools.partial(chat_with_bot, api_key=api_key, base_url=get_base_url(),
+                               context=build_bot_context(), version=data_version,
+                               cache=get_response_cache())
+    st.session_state["bot_last_job"] = get_bot_pool().ask(
+        turns, len(turns) - 1, answer, st.session_state["bot_cancel"],
+        after=st.session_state.get("bot_last_job"))
+
+def prewarm_answers(api_key: str, context: str, version: str, questions: list):
+    cache  = get_response_cache()
+    system = SYSTEM_PROMPT.format(context=context)
+    for q in questions:
+        key = bot_cache.cache_key(context, q, [])
+        if cache.contains(key):
+            continue
+        answer, ok = call_messages_api(api_key, system, to_messages(q, []))
+        if ok:
+            cache.put(key, answer, version)
+
+# Optional (BOT_PREWARM = "true" in secrets): after a data refresh, the first
+# session on the unfiltered view answers the quick questions in the
+# background. The marker makes this happen once per version across replicas.
+@st.cache_resource
+def start_prewarm(version: str, _context: str, questions: tuple) -> bool:
+    api_key = get_api_key()
+    if not api_key.startswith("sk-") or not get_response_cache().claim_marker(f"prewarm:{version}"):
+        return False
+    invalidate_stale_answers(version)
+    threading.Thread(target=prewarm_answers, args=(api_key, _context, version, list(questions)),
+                     daemon=True).start()
+    return True
 
 # Quick questions
 st.markdown("**💡 Quick questions:**")
 quick_questions = [
     "Which corporates are at risk of churning this month?",
-    "Which corporates have already churned in 2026?",
-    "Which corporates are declining vs 2025?",
+    f"Which corporates have already churned in {cur_year}?",
+    f"Which corporates are declining vs {prev_year}?",
     "Which corporates have the highest growth this year?",
     "Which industries are growing and which are declining?",
     "Which account managers have the highest churn risk?",
@@ -932,33 +1019,50 @@ quick_questions = [
     "Which corporates reduced rides in the last 2 weeks?",
     "Which corporates have the biggest growth opportunity?",
 ]
+if (get_secret("BOT_PREWARM").lower() == "true" and years == model.year_pair
+        and (corporate, industry, assignee, month_filter) == ("All", "All", "All", "All")):
+    start_prewarm(data_version, build_bot_context(), tuple(quick_questions))
+
 qq_cols = st.columns(3)
 for i, q in enumerate(quick_questions):
     with qq_cols[i % 3]:
         if st.button(q, key=f"qq_{i}", use_container_width=True):
-            st.session_state["chat_history"].append({"user": q, "bot": "..."})
-            with st.spinner("Analysing data..."):
-                answer = chat_with_bot(q, st.session_state["chat_history"][:-1])
-            st.session_state["chat_history"][-1]["bot"] = answer
-            st.rerun()
-
-# Chat display
-for turn in st.session_state["chat_history"]:
-    with st.chat_message("user"):
-        st.markdown(turn["user"])
-    with st.chat_message("assistant", avatar="🤖"):
-        st.markdown(turn["bot"])
+            ask_bot(q)
 
-# Chat input
 user_input = st.chat_input("Ask about retention, churn, growth, or assignee performance…")
 if user_input:
-    st.session_state["chat_history"].append({"user": user_input, "bot": "..."})
-    with st.spinner("Analysing data..."):
-        answer = chat_with_bot(user_input, st.session_state["chat_history"][:-1])
-    st.session_state["chat_history"][-1]["bot"] = answer
-    st.rerun()
+    ask_bot(user_input)
+
+# Chat display — a fragment, so while answers are pending only this block
+# re-runs (polling the worker pool), not the whole dashboard.
+def show_chat():
+    turns   = st.session_state["chat_history"]
+    pending = any(t["bot"] is None for t in turns)
+    for turn in turns:
+        with st.chat_message("user"):
+            st.markdown(turn["user"])
+        with st.chat_message("assistant", avatar="🤖"):
+            if turn["bot"] is not None:
+                st.markdown(turn["bot"])
+            elif turn.get("partial"):
+                st.markdown(turn["partial"] + " ▌")
+            else:
+                st.markdown("_Analysing data..._")
+    if st.session_state.get("chat_polling") and not pending:
+        # Last answer arrived: one full rerun switches polling off.
+        st.session_state["chat_polling"] = False
+        st.rerun()
+    st.session_state["chat_polling"] = pending
+
+chat_pending = any(t["bot"] is None for t in st.session_state["chat_history"])
+st.fragment(show_chat, run_every=0.5 if chat_pending else None)()
 
 if st.session_state["chat_history"]:
     if st.button("🗑️ Clear Chat", key="clear_chat"):
+        st.session_state["bot_cancel"].set()
+        st.session_state["bot_cancel"] = threading.Event()
+        st.session_state.pop("bot_last_job", None)
         st.session_state["chat_history"] = []
-        st.rerun()
\ No newline at end of file
+        st.rerun()
+
+perf.TIMER.record("rerun", time.perf_counter() - rerun_start)
@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import data_store
+import engine
+import sql_store
+import timeseries
+
+# ─────────────────────────────────────────────
+# BENCHMARK SUITE
+#
+# Times every dashboard stage on synthetic workbooks shaped like data.xlsx,
+# outside Streamlit, so scaling can be measured and compared between
+# versions. Each stage runs on the same inputs the app gives it:
+#
+#   parse          pd.read_excel of all sheets (cold load)
+#   normalize      data_store.normalize_sheets
+#   series         data_store.build_model (long-format store + wide pivots)
+#   pivot          timeseries pivots of data_store.series_store: all weeks,
+#                  the last 12 weeks, Feb–Apr
+#   load_cached    data_store.load_model served from the Parquet cache
+#   filter_index   engine.build_filter_index
+#   filter         engine.apply_filters over a fixed set of selections
+#   sum_merge      engine.sum_months ×3 + engine.build_merged (all months)
+#   dashboard      engine.compute_dashboard over the same selections
+#   cube_build     engine.build_cube
+#   cube_slice     engine.slice_cube over the same selections
+#   churn          engine.build_churn_frame + every churn window
+#   sql_build      sql_store.build_database (the SQL backend's file)
+#   sql_filter     SqlStore.apply_filters of the week sheet over the same selections
+#   sql_dashboard  SqlStore.compute_dashboard (queries only) over the same selections
+#   sql_churn      SqlStore.build_churn_frame + every churn window
+#   trend          engine.trend_frame (all weeks)
+#   bot_context    the data- and filter-dependent bot context sections
+#
+# Usage:
+#   python benchmark.py --corporates 100 1000 10000 --weeks 20 52 -o bench.json
+#   python benchmark.py --corporates 1000 --compare bench.json
+#
+# The output is JSON: run metadata plus one record per (size, stage) with
+# min/median/max seconds, and per size the bytes held by each model frame
+# (data_store.memory_report). --compare prints the median ratio against an
+# earlier file and exits non-zero when a stage slowed down past --tolerance.
+# ─────────────────────────────────────────────
+STAGES = ["parse", "normalize", "series", "pivot", "load_cached", "filter_index", "filter",
+          "sum_merge", "dashboard", "cube_build", "cube_slice", "churn", "sql_build", "sql_filter", "sql_dashboard", "sql_churn",
+          "trend", "bot_context"]
+
+def synthetic_sheets(corporates: int = 1000, industries: int = 12, assignees: int = 8,
+                     months: int = 5, weeks: int = 20, seed: int = 0) -> dict:
+    """{sheet: frame} in the data.xlsx layout.
+
+    Every corporate has a Target row; ~90% billed in 2025 and ~85% in 2026
+    (so some churn and some new business), and weekly rows exist for the
+    2026 corporates with ~10% going quiet in the trailing weeks.
+    """
+    rng   = np.random.default_rng(seed)
+    names = np.array([f"Corporate {i:06d}" for i in range(corporates)], dtype=object)
+    ind   = np.array([f"Industry {i:02d}" for i in range(industries)], dtype=object)[rng.integers(0, industries, corporates)]
+    asn   = np.array([f"Assignee {i:02d}" for i in range(assignees)], dtype=object)[rng.integers(0, assignees, corporates)]
+    scale = rng.lognormal(10, 1.2, corporates)
+
+    def sheet(mask, cols, factor):
+        n    = int(mask.sum())
+        vals = (scale[mask, None] * factor * rng.uniform(0.6, 1.4, (n, len(cols)))).round(0)
+        frame = pd.DataFrame(vals, columns=cols)
+        frame.insert(0, "Assignee_", asn[mask])
+        frame.insert(0, "industry_", ind[mask])
+        frame.insert(0, "Corporates", names[mask])
+        return frame
+
+    month_cols = data_store.MONTH_COLS
+    week_cols  = [f"week {i}" for i in range(1, weeks + 1)]
+    everyone   = np.ones(corporates, dtype=bool)
+    in_2025    = rng.random(corporates) < 0.90
+    in_2026    = rng.random(corporates) < 0.85
+    week_df    = sheet(in_2026, week_cols, 0.25)
+    quiet      = rng.random(len(week_df)) < 0.10
+    week_df.loc[quiet, week_cols[-min(4, weeks):]] = 0.0
+    return {
+        "Target":         sheet(everyone, month_cols, 1.1),
+        "2025":           sheet(in_2025, month_cols, 1.0),
+        "2026":           sheet(in_2026, month_cols[:months], 1.05),
+        "2026_week_data": week_df,
+    }
+
+def write_workbook(sheets: dict, path: str):
+    with pd.ExcelWriter(path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+def selections(sheets: dict) -> list:
+    """Filter combinations exercised per size: none, one industry, one assignee, one corporate."""
+    target = sheets["Target"]
+    return [
+        (engine.ALL, engine.ALL, engine.ALL),
+        (engine.ALL, target["industry_"].iloc[0], engine.ALL),
+        (engine.ALL, engine.ALL, target["Assignee_"].iloc[0]),
+        (target["Corporates"].iloc[len(target) // 2], engine.ALL, engine.ALL),
+    ]
+
+def timed(fn, repeat: int) -> tuple:
+    """(last result, [seconds per run])."""
+    result, times = None, []
+    for _ in range(repeat):
+        start  = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, times
+
+def run_size(params: dict, repeat: int, workdir: str) -> tuple:
+    """({stage: [seconds]}, memory report rows) for one synthetic workbook."""
+    raw  = synthetic_sheets(**params)
+    path = os.path.join(workdir, "data.xlsx")
+    write_workbook(raw, path)
+    month_cols = data_store.MONTH_COLS
+    timings    = {}
+
+    parsed, timings["parse"] = timed(lambda: data_store.parse_workbook(path), repeat)
+    (clean, report), timings["normalize"] = timed(lambda: data_store.normalize_sheets(parsed), repeat)
+    model, timings["series"] = timed(lambda: data_store.build_model("bench", clean, report), repeat)
+    sheets, years, week_cols = model.sheets, model.year_pair, model.week_cols
+    week_start = timeseries.period_start(week_cols[-min(12, len(week_cols))], int(years[1]))
+    store      = data_store.series_store(model)
+    _, timings["pivot"] = timed(lambda: [
+        store.pivot(model.week_sheet),
+        store.pivot(model.week_sheet, start=week_start),
+        store.pivot(years[1], f"{years[1]}-02-01", f"{years[1]}-04-01"),
+    ], repeat)
+    version = data_store.data_version(path)
+    data_store.load_model(path, version)   # populate the Parquet cache
+    _, timings["load_cached"] = timed(lambda: data_store.load_model(path, version), repeat)
+
+    index, timings["filter_index"] = timed(lambda: engine.build_filter_index(sheets), repeat)
+    combos = selections(sheets)
+    _, timings["filter"] = timed(
+        lambda: [engine.apply_filters(sheets, index, *c) for c in combos], repeat)
+
+    def sum_merge():
+        totals = [engine.sum_months(sheets[s], month_cols, s) for s in (years[1], years[0], "Target")]
+        return engine.build_merged(*totals, sheets["Target"], sheets[years[0]], years)
+    _, timings["sum_merge"] = timed(sum_merge, repeat)
+    dashes, timings["dashboard"] = timed(
+        lambda: [engine.compute_dashboard(sheets, index, *c, engine.ALL, month_cols, years=years)
+                 for c in combos], repeat)
+    cube, timings["cube_build"] = timed(lambda: engine.build_cube(sheets, month_cols, years), repeat)
+    _, timings["cube_slice"] = timed(
+        lambda: [engine.slice_cube(cube, *c, engine.ALL) for c in combos], repeat)
+
+    def churn():
+        frame = engine.build_churn_frame(sheets["Target"], sheets[years[0]], sheets[years[1]],
+                                         sheets[model.week_sheet], month_cols, week_cols, years)
+        return [engine.churned_for_period(frame, d) for d in engine.CHURN_WINDOWS] + [engine.churned_global(frame)]
+    _, timings["churn"] = timed(churn, repeat)
+
+    db_path = os.path.join(workdir, sql_store.DB_FILE)
+    def sql_build():
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        sql_store.build_database(model, db_path)
+    _, timings["sql_build"] = timed(sql_build, repeat)
+    store = sql_store.SqlStore(db_path)
+    week = {model.week_sheet: model.sheets[model.week_sheet]}
+    _, timings["sql_filter"] = timed(lambda: [store.apply_filters(*c, week) for c in combos], repeat)
+    _, timings["sql_dashboard"] = timed(
+        lambda: [store.compute_dashboard(*c, engine.ALL, month_cols, years, {}) for c in combos], repeat)
+    def sql_churn():
+        frame = store.build_churn_frame(month_cols, model.week_sheet, week_cols, years)
+        return [engine.churned_for_period(frame, d) for d in engine.CHURN_WINDOWS] + [engine.churned_global(frame)]
+    _, timings["sql_churn"] = timed(sql_churn, repeat)
+    _, timings["trend"] = timed(
+        lambda: engine.trend_frame(sheets[model.week_sheet], week_cols), repeat)
+
+    dash = dashes[0]
+    def bot_context():
+        totals = (dash["total_target"], dash["total_current"], dash["total_previous"], dash["shortfall"],
+                  dash["growth_vs_target"], dash["growth_vs_previous"])
+        prev, cur = sheets[years[0]], sheets[years[1]]
+        return "\n".join([
+            engine.context_churn_section(prev, cur, years),
+            engine.context_yoy_section(sheets["Target"], prev, cur, month_cols, years),
+            engine.context_weekly_section(sheets["Target"], sheets[model.week_sheet], week_cols),
+            engine.context_totals_section(*totals, years),
+            engine.context_group_section(dash["merged"], "industry_", "Industry", years),
+            engine.context_group_section(dash["merged"], "Assignee_", "Assignee", years),
+        ])
+    _, timings["bot_context"] = timed(bot_context, repeat)
+    memory = data_store.memory_report(sheets)
+    return timings, memory.to_dict("records")
+
+def summarize(params: dict, timings: dict) -> list:
+    return [{**params, "stage": stage,
+             "min": min(times), "median": statistics.median(times), "max": max(times),
+             "runs": len(times)}
+            for stage, times in timings.items()]
+
+def _key(record: dict) -> tuple:
+    return tuple(record[k] for k in ("corporates", "industries", "assignees", "months", "weeks", "stage"))
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """Records present in both runs whose median grew by more than `tolerance` (e.g. 0.2 = 20%)."""
+    previous = {_key(r): r for r in baseline}
+    slower   = []
+    for r in results:
+        old = previous.get(_key(r))
+        if old is None or old["median"] <= 0:
+            continue
+        ratio = r["median"] / old["median"]
+        print(f"{r['corporates']:>7} corp {r['weeks']:>2}w  {r['stage']:<13} "
+              f"{old['median']*1000:9.2f} ms → {r['median']*1000:9.2f} ms  ×{ratio:.2f}")
+        if ratio > 1 + tolerance:
+            slower.append({**r, "baseline_median": old["median"], "ratio": ratio})
+    return slower
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every dashboard stage on synthetic workbooks.")
+    parser.add_argument("--corporates", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--industries", type=int, default=12)
+    parser.add_argument("--assignees",  type=int, default=8)
+    parser.add_argument("--months",     type=int, default=5, help="months present in the 2026 sheet (1–12)")
+    parser.add_argument("--weeks",      type=int, nargs="+", default=[20], help="week columns (20–52)")
+    parser.add_argument("--repeat",     type=int, default=5)
+    parser.add_argument("--seed",       type=int, default=0)
+    parser.add_argument("-o", "--output", default="bench.json")
+    parser.add_argument("--compare",    help="earlier output file to compare medians against")
+    parser.add_argument("--tolerance",  type=float, default=0.2)
+    args = parser.parse_args(argv)
+    if not 1 <= args.months <= 12:
+        parser.error("--months must be between 1 and 12")
+    baseline = None
+    if args.compare:   # read before the run: --output may be the same file
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results, memory = [], []
+    workdir  = tempfile.mkdtemp(prefix="retention-bench-")
+    data_store.CACHE_DIR = os.path.join(workdir, ".data_cache")   # keep the app's cache untouched
+    try:
+        for weeks in args.weeks:
+            for corporates in args.corporates:
+                params = {"corporates": corporates, "industries": args.industries,
+                          "assignees": args.assignees, "months": args.months,
+                          "weeks": weeks, "seed": args.seed}
+                print(f"{corporates} corporates, {weeks} weeks …", file=sys.stderr)
+                timings, frames = run_size(params, args.repeat, workdir)
+                records = summarize(params, timings)
+                for r in records:
+                    print(f"  {r['stage']:<13} median {r['median']*1000:9.2f} ms", file=sys.stderr)
+                before = sum(f["Before (bytes)"] for f in frames)
+                after  = sum(f["After (bytes)"] for f in frames)
+                print(f"  {'memory':<13} {before / 1e6:9.2f} MB plain → {after / 1e6:.2f} MB held", file=sys.stderr)
+                results.extend(records)
+                memory.extend({**params, **f} for f in frames)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created":  datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python":   platform.python_version(),
+        "pandas":   pd.__version__,
+        "numpy":    np.__version__,
+        "platform": platform.platform(),
+        "results":  results,
+        "memory":   memory,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+    if baseline is not None:
+        slower = compare(results, baseline, args.tolerance)
+        if slower:
+            print(f"{len(slower)} stage(s) slower than ×{1 + args.tolerance:.2f}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
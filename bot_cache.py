@@ -0,0 +1,119 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+# ─────────────────────────────────────────────
+# BOT RESPONSE CACHE
+#
+# Persistent cache of Retention Bot answers, keyed on (context hash,
+# normalized question, prior history). Stored in SQLite so it survives
+# restarts and is shared by every session and every replica on the same
+# volume. Entries expire after a TTL, the table is trimmed to a maximum size
+# (least recently used first) and everything from older data versions is
+# dropped as soon as a new data.xlsx is loaded.
+# ─────────────────────────────────────────────
+BASE_DIR         = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE       = os.path.join(BASE_DIR, ".bot_cache.sqlite3")
+DEFAULT_MAX      = 500
+DEFAULT_TTL_SECS = 24 * 3600
+
+def normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+def context_hash(context: str) -> str:
+    return hashlib.sha256(context.encode()).hexdigest()
+
+def cache_key(context: str, question: str, history: list) -> str:
+    turns = [[normalize_question(t["user"]), t["bot"]] for t in history]
+    raw = json.dumps([context_hash(context), normalize_question(question), turns])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+class ResponseCache:
+    def __init__(self, path: str = CACHE_FILE, max_entries: int = DEFAULT_MAX,
+                 ttl_secs: int = DEFAULT_TTL_SECS):
+        self.path        = path
+        self.max_entries = max_entries
+        self.ttl_secs    = ttl_secs
+        self._lock       = threading.Lock()
+        with self._db() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, version TEXT, answer TEXT,
+                created REAL, last_used REAL)""")
+            db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+            db.execute("CREATE TABLE IF NOT EXISTS markers (name TEXT PRIMARY KEY, created REAL)")
+
+    @contextmanager
+    def _db(self):
+        # One short-lived connection per operation; commits on success.
+        with self._lock:
+            db = sqlite3.connect(self.path, timeout=10)
+            try:
+                db.execute("PRAGMA journal_mode=WAL")
+                with db:
+                    yield db
+            finally:
+                db.close()
+
+    def _bump(self, db: sqlite3.Connection, name: str):
+        db.execute("INSERT INTO stats VALUES (?, 1) "
+                   "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def get(self, key: str):
+        """Cached answer for `key`, or None. Counts a hit or a miss."""
+        now = time.time()
+        with self._db() as db:
+            row = db.execute("SELECT answer, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_secs:
+                self._bump(db, "misses")
+                return None
+            db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._bump(db, "hits")
+            return row[0]
+
+    def contains(self, key: str) -> bool:
+        """Like get() but without touching recency or hit/miss counts."""
+        with self._db() as db:
+            row = db.execute("SELECT created FROM responses WHERE key = ?", (key,)).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl_secs
+
+    def put(self, key: str, answer: str, version: str):
+        now = time.time()
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                       (key, version, answer, now, now))
+            db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_secs,))
+            db.execute("""DELETE FROM responses WHERE key NOT IN (
+                SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)""", (self.max_entries,))
+
+    def invalidate_other_versions(self, version: str) -> int:
+        """Drop every answer generated against a different data version."""
+        with self._db() as db:
+            return db.execute("DELETE FROM responses WHERE version != ?", (version,)).rowcount
+
+    def claim_marker(self, name: str) -> bool:
+        """True for the first caller (across processes) to claim `name`."""
+        with self._db() as db:
+            return db.execute("INSERT OR IGNORE INTO markers VALUES (?, ?)",
+                              (name, time.time())).rowcount == 1
+
+    def clear(self):
+        with self._db() as db:
+            db.execute("DELETE FROM responses")
+            db.execute("DELETE FROM stats")
+
+    def stats(self) -> dict:
+        with self._db() as db:
+            counts  = dict(db.execute("SELECT name, value FROM stats").fetchall())
+            entries = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        hits, misses = counts.get("hits", 0), counts.get("misses", 0)
+        return {
+            "hits":     hits,
+            "misses":   misses,
+            "hit_rate": round(hits / (hits + misses) * 100, 1) if hits + misses else 0.0,
+            "entries":  entries,
+        }
@@ -0,0 +1,265 @@
+import ssl
+import json
+import time
+import random
+import threading
+import http.client
+from collections import deque
+from urllib.parse import urlsplit
+
+import perf
+
+# ─────────────────────────────────────────────
+# MESSAGES API CLIENT
+#
+# Shared client for the Anthropic Messages API used by the Retention Bot.
+# One BotClient per base URL lives for the whole process, so every session
+# reuses its keep-alive connections, shares one concurrency cap, and is
+# retried with jittered exponential backoff on 429/5xx (honouring
+# Retry-After) instead of failing on the first rate limit. Each request's
+# latency, time to first byte, status and attempt count go into a ring
+# buffer for metrics().
+#
+# stream() consumes the server-sent-event response and yields text as it
+# arrives; complete() returns the whole answer. Both raise BotError with a
+# message that can be shown to the user as-is. `base_url` can point at
+# mock_messages_api.py to exercise streaming, cancellation, retry and error
+# paths offline.
+# ─────────────────────────────────────────────
+API_URL         = "https://api.anthropic.com"
+API_VERSION     = "2023-06-01"
+MODEL           = "claude-sonnet-4-20250514"
+MAX_TOKENS      = 1500
+TIMEOUT         = 60
+MAX_CONCURRENCY = 8
+MAX_RETRIES     = 3
+BACKOFF_BASE    = 0.5
+BACKOFF_MAX     = 8.0
+RETRY_STATUSES  = {429, 500, 502, 503, 504, 529}
+
+class BotError(Exception):
+    """A failed bot request; str(error) is a displayable message."""
+
+def iter_sse(lines):
+    """Yield (event, data) pairs from an iterable of SSE byte lines."""
+    event, data = None, []
+    for raw in lines:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = None, []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip())
+    if data:
+        yield event, "\n".join(data)
+
+class BotClient:
+    def __init__(self, base_url: str = API_URL, max_concurrency: int = MAX_CONCURRENCY,
+                 max_retries: int = MAX_RETRIES, timeout: float = TIMEOUT,
+                 backoff_base: float = BACKOFF_BASE, backoff_max: float = BACKOFF_MAX):
+        parts = urlsplit(base_url)
+        self.scheme      = parts.scheme or "https"
+        self.host        = parts.hostname
+        self.port        = parts.port
+        self.path        = parts.path.rstrip("/") + "/v1/messages"
+        self.max_retries = max_retries
+        self.timeout     = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max  = backoff_max
+        self._slots      = threading.BoundedSemaphore(max_concurrency)
+        self._idle       = deque(maxlen=max_concurrency)
+        self._lock       = threading.Lock()
+        self._samples    = deque(maxlen=500)
+        self._in_flight  = 0
+
+    # ── connection pool ──────────────────────
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                               context=ssl.create_default_context())
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self) -> tuple:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, conn: http.client.HTTPConnection, resp=None):
+        if resp is not None and resp.will_close:
+            conn.close()
+            return
+        with self._lock:
+            if len(self._idle) == self._idle.maxlen:
+                conn.close()
+            else:
+                self._idle.append(conn)
+
+    def _backoff(self, attempt: int, retry_after: str = None) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        try:
+            delay = max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+        return min(delay, self.backoff_max)
+
+    # ── requests ─────────────────────────────
+    def _send(self, api_key: str, payload: dict, sample: dict) -> tuple:
+        """POST with retries; returns (conn, resp) for a 2xx response."""
+        body = json.dumps(payload).encode()
+        headers = {
+            "Content-Type":      "application/json",
+            "x-api-key":         api_key,
+            "anthropic-version": API_VERSION,
+        }
+        attempt = 0
+        while True:
+            conn, reused = self._acquire()
+            sample["attempts"] += 1
+            try:
+                conn.request("POST", self.path, body, headers)
+                resp = conn.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if reused:
+                    continue  # stale keep-alive connection; retry on a fresh one
+                if attempt >= self.max_retries:
+                    raise BotError(f"⚠️ Bot error: {e}") from e
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            sample["status"] = resp.status
+            if resp.status < 400:
+                sample["ttfb"] = time.perf_counter() - sample["start"]
+                return conn, resp
+            error_body = resp.read().decode("utf-8", errors="ignore")
+            self._release(conn, resp)
+            if resp.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                raise BotError(f"⚠️ API error {resp.status}: {error_body}")
+            time.sleep(self._backoff(attempt, resp.getheader("retry-after")))
+            attempt += 1
+
+    def _begin(self) -> dict:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise BotError("⚠️ Bot is busy — too many questions in flight. Please try again.")
+        with self._lock:
+            self._in_flight += 1
+        return {"start": time.perf_counter(), "attempts": 0, "status": None, "ttfb": None, "ok": False}
+
+    def _end(self, sample: dict):
+        sample["latency"] = time.perf_counter() - sample.pop("start")
+        with self._lock:
+            self._in_flight -= 1
+            self._samples.append(sample)
+        self._slots.release()
+
+    def _payload(self, system: str, messages: list, stream: bool) -> dict:
+        payload = {"model": MODEL, "max_tokens": MAX_TOKENS, "system": system, "messages": messages}
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def complete(self, api_key: str, system: str, messages: list) -> str:
+        """Blocking request; returns the full answer text."""
+        sample = self._begin()
+        try:
+            conn, resp = self._send(api_key, self._payload(system, messages, False), sample)
+            try:
+                data = json.loads(resp.read())
+            except Exception as e:
+                conn.close()
+                raise BotError(f"⚠️ Bot error: {e}") from e
+            self._release(conn, resp)
+            try:
+                text = data["content"][0]["text"]
+            except Exception as e:
+                raise BotError(f"⚠️ Bot error: {e}") from e
+            sample["ok"] = True
+            return text
+        finally:
+            self._end(sample)
+
+    def stream(self, api_key: str, system: str, messages: list, cancel=None):
+        """Yield answer text chunks as they arrive.
+
+        `cancel` is an optional threading.Event; once set, the connection is
+        closed and the generator stops. Closing the generator does the same.
+        Retries only happen before the first byte of a successful response.
+        """
+        sample = self._begin()
+        conn = resp = None
+        finished = False
+        try:
+            conn, resp = self._send(api_key, self._payload(system, messages, True), sample)
+            for event, data in iter_sse(resp):
+                if cancel is not None and cancel.is_set():
+                    return
+                body = json.loads(data)
+                kind = body.get("type", event)
+                if kind == "content_block_delta" and body["delta"].get("type") == "text_delta":
+                    yield body["delta"]["text"]
+                elif kind == "error":
+                    err = body.get("error", {})
+                    raise BotError(f"⚠️ API error: {err.get('type', 'error')}: {err.get('message', '')}")
+                elif kind == "message_stop":
+                    resp.read()
+                    finished = True
+                    sample["ok"] = True
+                    return
+            if cancel is None or not cancel.is_set():   # cut off: never pass partial text as an answer
+                raise BotError("⚠️ Bot error: stream ended before message_stop")
+        except BotError:
+            raise
+        except Exception as e:
+            raise BotError(f"⚠️ Bot error: {e}") from e
+        finally:
+            if conn is not None:
+                if finished:
+                    self._release(conn, resp)
+                else:
+                    conn.close()
+            self._end(sample)
+
+    def metrics(self) -> dict:
+        """Counts and latency percentiles (seconds) over the recent requests."""
+        with self._lock:
+            samples, in_flight = list(self._samples), self._in_flight
+        latencies = [s["latency"] for s in samples]
+        ttfbs     = [s["ttfb"] for s in samples if s["ttfb"] is not None]
+        return {
+            "requests":    len(samples),
+            "errors":      sum(not s["ok"] for s in samples),
+            "retries":     sum(s["attempts"] - 1 for s in samples),
+            "in_flight":   in_flight,
+            "latency_p50": perf.percentile(latencies, 0.50),
+            "latency_p95": perf.percentile(latencies, 0.95),
+            "ttfb_p50":    perf.percentile(ttfbs, 0.50),
+        }
+
+# ─────────────────────────────────────────────
+# SHARED CLIENTS
+# ─────────────────────────────────────────────
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(base_url: str = API_URL) -> BotClient:
+    """Process-wide client for `base_url`."""
+    with _clients_lock:
+        if base_url not in _clients:
+            _clients[base_url] = BotClient(base_url)
+        return _clients[base_url]
+
+def all_metrics() -> dict:
+    """{base_url: metrics()} for every client created in this process."""
+    with _clients_lock:
+        clients = dict(_clients)
+    return {url: client.metrics() for url, client in clients.items()}
+
+def complete(api_key: str, system: str, messages: list, base_url: str = API_URL) -> str:
+    return get_client(base_url).complete(api_key, system, messages)
+
+def stream(api_key: str, system: str, messages: list, base_url: str = API_URL, cancel=None):
+    return get_client(base_url).stream(api_key, system, messages, cancel)
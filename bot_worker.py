@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# ─────────────────────────────────────────────
+# BOT WORKER POOL
+#
+# Retention Bot questions are answered on a process-wide thread pool instead
+# of the Streamlit script thread, so a session keeps filtering and reading
+# charts while answers are generated. Each question is a chat turn dict
+# ({"user": ..., "bot": None}); the worker fills turn["partial"] while text
+# streams in and sets turn["bot"] when done. Questions from one session are
+# chained so each is sent with the answers before it in its history: a
+# question is only submitted once the previous one has finished, so queued
+# follow-ups hold no pool thread while they wait.
+# ─────────────────────────────────────────────
+MAX_WORKERS = 8
+CANCELLED   = "⏹️ _Question cancelled._"
+
+class BotWorkerPool:
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="retention-bot")
+
+    def ask(self, turns: list, index: int, answer, cancel: threading.Event, after=None):
+        """Answer turns[index] in the background; returns its Future.
+
+        `answer(question, history, cancel)` yields text chunks. `after` is the
+        session's previous Future: this question is submitted when it is done,
+        so its history includes that answer. Setting `cancel` abandons queued
+        and running questions.
+        """
+        args = (turns, index, answer, cancel)
+        if after is None or after.done():
+            return self._executor.submit(self._run, *args)
+        chained = Future()
+        def start(_):
+            try:
+                job = self._executor.submit(self._run, *args)
+            except RuntimeError as e:   # pool shut down
+                chained.set_exception(e)
+                return
+            job.add_done_callback(lambda done: _settle(chained, done))
+        after.add_done_callback(start)
+        return chained
+
+    @staticmethod
+    def _run(turns: list, index: int, answer, cancel: threading.Event):
+        turn = turns[index]
+        if cancel.is_set():
+            turn["bot"] = CANCELLED
+            return
+        history = [{"user": t["user"], "bot": t["bot"]} for t in turns[:index]]
+        parts = []
+        try:
+            for chunk in answer(turn["user"], history, cancel):
+                parts.append(chunk)
+                turn["partial"] = "".join(parts)
+            turn["bot"] = "".join(parts) if not cancel.is_set() else CANCELLED
+        except Exception as e:
+            turn["bot"] = "".join(parts) + ("\n\n" if parts else "") + f"⚠️ Bot error: {e}"
+        finally:
+            turn.pop("partial", None)
+
+def _settle(target: Future, done: Future):
+    """Give `target` the outcome of the finished `done`."""
+    if done.exception() is not None:
+        target.set_exception(done.exception())
+    else:
+        target.set_result(done.result())
@@ -0,0 +1,124 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# ─────────────────────────────────────────────
+# CHART BUILDERS
+#
+# Every dashboard figure is built from the aggregates returned by
+# engine.compute_dashboard, so a figure is fully determined by the data
+# version and the filter state. build_figures() returns them all at once so
+# the app can cache the finished Figure objects per filter combination; an
+# unchanged chart is then re-sent without touching the aggregations or
+# rebuilding Plotly objects.
+# ─────────────────────────────────────────────
+LINE_COLORS = ["#FF0000","#0000FF","#00C853"]   # Target, comparison year, current year
+
+def monthly_line(monthly_chart_df: pd.DataFrame, years: tuple) -> go.Figure:
+    prev, cur = years
+    fig_line = go.Figure()
+    for metric, color in zip(["Target", prev, cur], LINE_COLORS):
+        fig_line.add_trace(go.Scatter(
+            x=monthly_chart_df["Month"], y=monthly_chart_df[metric], name=metric,
+            mode="lines+markers+text",
+            text=monthly_chart_df[metric].round(0).astype(int).astype(str),
+            textposition="top center",
+            line=dict(width=2, color=color), marker=dict(size=8)
+        ))
+    fig_line.update_layout(
+        title=f"Monthly Performance: {cur} vs {prev} vs Target",
+        xaxis_title="Month", yaxis_title="Revenue",
+        template="plotly_white", height=400
+    )
+    return fig_line
+
+def assignee_pie(agg_asn: pd.DataFrame, cur: str) -> go.Figure:
+    fig_pie = px.pie(
+        agg_asn, names="Assignee", values=cur,
+        title=f"{cur} Revenue Breakdown by Assignee",
+        color_discrete_sequence=px.colors.qualitative.Bold
+    )
+    fig_pie.update_layout(height=400)
+    return fig_pie
+
+def industry_bar(agg_ind: pd.DataFrame, cur: str) -> go.Figure:
+    fig_bar_ind = px.bar(
+        agg_ind, x=cur, y="Industry", orientation="h",
+        title=f"{cur} Revenue by Industry",
+        color=cur, color_continuous_scale="Blues"
+    )
+    fig_bar_ind.update_layout(height=400, showlegend=False)
+    return fig_bar_ind
+
+def yoy_bar(yoy_combined: pd.DataFrame, prev: str) -> go.Figure:
+    fig_yoy = px.bar(
+        yoy_combined, x=f"% vs {prev}", y="Corporates", orientation="h",
+        title=f"Top Growth & Biggest Declines vs {prev} (%)",
+        color=f"% vs {prev}", color_continuous_scale="RdYlGn", color_continuous_midpoint=0
+    )
+    fig_yoy.update_layout(height=500, showlegend=False)
+    return fig_yoy
+
+def attainment_bar(attain: pd.DataFrame, cur: str) -> go.Figure:
+    fig_attain = px.bar(
+        attain, x="Assignee", y="Attainment %",
+        title=f"Target Attainment % per Assignee ({cur})",
+        color="Attainment %", color_continuous_scale="RdYlGn",
+        color_continuous_midpoint=100, text="Attainment %"
+    )
+    fig_attain.add_hline(y=100, line_dash="dash", line_color="red", annotation_text="Target = 100%")
+    fig_attain.update_traces(texttemplate="%{text:.1f}%", textposition="outside")
+    fig_attain.update_layout(height=400, showlegend=False)
+    return fig_attain
+
+def weekly_rows(week_df: pd.DataFrame, present_weeks: list, corporate: str) -> pd.DataFrame:
+    """Corporate × week values to plot: the selected corporate, or the top 5 by total."""
+    if corporate != "All":
+        plot_df = week_df[week_df["Corporates"] == corporate]
+    else:
+        plot_df = week_df.loc[week_df[present_weeks].astype(float).sum(axis=1).nlargest(5).index]
+    return (plot_df.drop_duplicates("Corporates")
+            .set_index("Corporates")[present_weeks].astype(float))
+
+def weekly_line(rows: pd.DataFrame) -> go.Figure:
+    fig_weekly = go.Figure()
+    weeks = list(rows.columns)
+    for corp, vals in rows.iterrows():
+        fig_weekly.add_trace(go.Scatter(
+            x=weeks, y=vals.tolist(), mode="lines+markers", name=corp,
+            line=dict(width=2), marker=dict(size=6)
+        ))
+    fig_weekly.update_layout(
+        title="Weekly Revenue Trend (Top 5 or Selected)",
+        xaxis_title="Week", yaxis_title="Revenue",
+        template="plotly_white", height=400
+    )
+    return fig_weekly
+
+def weekly_heatmap(rows: pd.DataFrame) -> go.Figure:
+    heat_df = rows.rename_axis("Corporate")
+    fig_heat = px.imshow(heat_df, title="Weekly Revenue Heatmap",
+                         color_continuous_scale="Blues", aspect="auto")
+    fig_heat.update_layout(height=400)
+    return fig_heat
+
+def build_figures(dash: dict, corporate: str, week_sheet: str, week_cols: list) -> dict:
+    """{name: Figure or None} for every chart on the dashboard."""
+    prev, cur = dash["years"]
+    figures = {
+        "monthly":    monthly_line(dash["monthly"], dash["years"]),
+        "assignee":   assignee_pie(dash["agg_asn"], cur),
+        "industry":   industry_bar(dash["agg_ind"], cur),
+        "yoy":        yoy_bar(dash["yoy"], prev),
+        "attainment": attainment_bar(dash["attain"], cur),
+        "weekly":     None,
+        "heatmap":    None,
+    }
+    week_df = dash["filtered"][week_sheet]
+    if not week_df.empty:
+        present_weeks = [w for w in week_cols if w in week_df.columns]
+        rows = weekly_rows(week_df, present_weeks, corporate)
+        figures["weekly"] = weekly_line(rows)
+        if len(present_weeks) >= 2 and not rows.empty:
+            figures["heatmap"] = weekly_heatmap(rows)
+    return figures
@@ -0,0 +1,499 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import zipfile
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+import timeseries
+
+# ─────────────────────────────────────────────
+# WORKBOOK INGEST
+#
+# data.xlsx is parsed once (all sheets in a single openpyxl pass) and the
+# sheets are written to a Parquet cache keyed on the workbook's content hash.
+# Later starts — and any other replica sharing the directory — read the
+# columnar files instead of re-parsing the Excel file. A small manifest keyed
+# on (size, mtime) lets an unchanged file skip even the hashing step. The
+# cache holds the normalized sheets (see NORMALIZATION below): each sheet's
+# non-value columns, plus every month/week value in one long-format series
+# (timeseries.py); they are compacted on load (see MEMORY LAYOUT below).
+#
+# Sheets are found by name rather than listed: "Target", one sheet per year
+# ("2025", "2026", …) and weekly sheets ("2026_week_data"). The latest year
+# is the current one and the year before it the comparison year, so a new
+# year's sheets or more weeks need no code change.
+# ─────────────────────────────────────────────
+BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
+DATA_FILE  = os.path.join(BASE_DIR, "data.xlsx")
+CACHE_DIR  = os.path.join(BASE_DIR, ".data_cache")
+MANIFEST   = "manifest.json"
+REPORT     = "_coercions"
+SERIES     = "_series"
+PERIODS    = "_periods"
+DIGESTS    = "_digests.json"
+SHEET_LIST = "_sheets.json"
+SCHEMA     = 2   # bump when the cached representation changes
+
+TARGET_SHEET  = "Target"
+YEAR_SHEET_RE = re.compile(r"^\d{4}$")
+WEEK_SHEET_RE = re.compile(r"^(\d{4})_week_data$")
+
+KEY_COL     = "Corporates"
+META_COLS   = ["Corporates", "industry_", "Assignee_"]
+MONTH_COLS  = timeseries.MONTH_COLS
+WEEK_COL_RE = re.compile(r"^week \d+$")
+REPORT_COLS = ["Sheet", "Column", "Issue", "Cells"]
+MEMORY_COLS = ["Frame", "Rows", "Before (bytes)", "After (bytes)", "Saved %"]
+
+def is_dashboard_sheet(name: str) -> bool:
+    return name == TARGET_SHEET or bool(YEAR_SHEET_RE.match(name) or WEEK_SHEET_RE.match(name))
+
+def sheet_order(names) -> list:
+    """The dashboard sheets among `names`: Target, the year sheets, then the weekly sheets."""
+    return sorted((n for n in names if is_dashboard_sheet(n)),
+                  key=lambda n: (n != TARGET_SHEET, bool(WEEK_SHEET_RE.match(n)), n))
+
+def year_sheets(names) -> list:
+    return sorted(n for n in names if YEAR_SHEET_RE.match(n))
+
+def week_sheet(year: str) -> str:
+    return f"{year}_week_data"
+
+def _read_manifest() -> dict:
+    try:
+        with open(os.path.join(CACHE_DIR, MANIFEST), "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _write_json_atomic(path: str, payload: dict):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def data_version(path: str = DATA_FILE) -> str:
+    """Content hash of the workbook; re-hashes only when size/mtime change."""
+    st_ = os.stat(path)
+    stamp = {"path": os.path.abspath(path), "size": st_.st_size, "mtime_ns": st_.st_mtime_ns}
+    manifest = _read_manifest()
+    if manifest.get("stamp") == stamp and manifest.get("sha256"):
+        return manifest["sha256"]
+    digest = file_hash(path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _write_json_atomic(os.path.join(CACHE_DIR, MANIFEST), {"stamp": stamp, "sha256": digest})
+    return digest
+
+def cache_dir(version: str) -> str:
+    return os.path.join(CACHE_DIR, f"{version[:16]}-v{SCHEMA}")
+
+def prune_cache(versions: list):
+    """Delete every cache directory but those of `versions` (older schemas included)."""
+    kept = {os.path.basename(cache_dir(v)) for v in versions}
+    try:
+        entries = list(os.scandir(CACHE_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.is_dir() and entry.name not in kept:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+def _cache_path(version: str, name: str) -> str:
+    return os.path.join(cache_dir(version), f"{name}.parquet")
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def _read_cached(version: str):
+    """The cached DataModel for `version`, or None when it's missing or incomplete."""
+    folder = cache_dir(version)
+    n_rows = _read_json(os.path.join(folder, SHEET_LIST))   # written last: marks a complete entry
+    if n_rows is None:
+        return None
+    try:
+        meta   = {s: pd.read_parquet(_cache_path(version, s)) for s in n_rows}
+        store  = timeseries.from_frames(pd.read_parquet(_cache_path(version, SERIES)),
+                                        pd.read_parquet(_cache_path(version, PERIODS)), n_rows)
+        report = pd.read_parquet(_cache_path(version, REPORT))
+    except Exception:
+        return None
+    sheets = {s: compact_frame(store.wide(s, meta[s])) for s in n_rows}
+    return DataModel(version, sheets, report, _read_json(os.path.join(folder, DIGESTS)))
+
+def _write_cached(model):
+    folder = cache_dir(model.version)
+    os.makedirs(folder, exist_ok=True)
+    if model.digests is not None:
+        _write_json_atomic(os.path.join(folder, DIGESTS), model.digests)
+    store  = series_store(model)
+    frames = {
+        **{s: plain_frame(df.drop(columns=value_cols(df))) for s, df in model.sheets.items()},
+        SERIES:  store.frame(),
+        PERIODS: store.period_index(),
+        REPORT:  model.report,
+    }
+    for name, df in frames.items():
+        path = _cache_path(model.version, name)
+        tmp  = f"{path}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        except Exception:
+            # Sheets pyarrow cannot represent (mixed-type object columns) are
+            # simply not cached; the next start re-parses the workbook.
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+    _write_json_atomic(os.path.join(folder, SHEET_LIST), {s: len(df) for s, df in model.sheets.items()})
+
+def parse_workbook(path: str = DATA_FILE, sheets: list = None) -> dict:
+    """Parse the given sheets (every dashboard sheet by default) in one pass over the workbook."""
+    with pd.ExcelFile(path) as book:
+        return pd.read_excel(book, sheet_name=sheets or sheet_order(book.sheet_names))
+
+# ─────────────────────────────────────────────
+# SHEET DIGESTS
+#
+# An .xlsx file is a zip with one XML part per worksheet, so which sheets
+# changed between two versions can be read from the zip directory (CRC and
+# size per part) without parsing any cells. Text cells point into the shared
+# string table; sheets whose part is unchanged are only trusted when the old
+# table is a prefix of the new one (strings appended, none renumbered) —
+# otherwise every sheet counts as changed.
+# ─────────────────────────────────────────────
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL  = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+def _shared_strings(zf: zipfile.ZipFile) -> list:
+    try:
+        root = ET.fromstring(zf.read("xl/sharedStrings.xml"))
+    except KeyError:
+        return []
+    return ["".join(t.text or "" for t in si.iter(f"{_NS_MAIN}t")) for si in root.iter(f"{_NS_MAIN}si")]
+
+def _strings_digest(strings: list) -> str:
+    return hashlib.sha256("\x00".join(strings).encode("utf-8")).hexdigest()
+
+def workbook_digests(path: str = DATA_FILE) -> tuple:
+    """({"sheets": {sheet: part CRC/size}, "strings": {"count", "sha256"}}, shared strings).
+
+    Returns (None, []) when the file can't be read as an .xlsx package.
+    """
+    try:
+        return _read_digests(path)
+    except (zipfile.BadZipFile, KeyError, ET.ParseError):
+        return None, []
+
+def _read_digests(path: str) -> tuple:
+    with zipfile.ZipFile(path) as zf:
+        rels = {r.get("Id"): r.get("Target") for r in ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))}
+        parts = {}
+        for sheet in ET.fromstring(zf.read("xl/workbook.xml")).iter(f"{_NS_MAIN}sheet"):
+            if is_dashboard_sheet(sheet.get("name")):
+                target = rels[sheet.get(f"{_NS_REL}id")]
+                part   = target.lstrip("/") if target.startswith("/") else "xl/" + target
+                info   = zf.getinfo(part)
+                parts[sheet.get("name")] = f"{info.CRC:08x}-{info.file_size}"
+        strings = _shared_strings(zf)
+    return {"sheets": parts, "strings": {"count": len(strings), "sha256": _strings_digest(strings)}}, strings
+
+def changed_sheets(old: dict, new: dict, new_strings: list):
+    """Sheets of the new workbook whose content may differ from the old, or None if unknown (re-read all)."""
+    if not old or not new:
+        return None
+    count = old["strings"]["count"]
+    strings_stable = (
+        old["strings"] == new["strings"]
+        or (len(new_strings) >= count and _strings_digest(new_strings[:count]) == old["strings"]["sha256"])
+    )
+    if not strings_stable:
+        return None
+    return [s for s in sheet_order(new["sheets"]) if old["sheets"].get(s) != new["sheets"].get(s)]
+
+# ─────────────────────────────────────────────
+# NORMALIZATION
+#
+# Runs once per workbook version, before the Parquet cache is written:
+# month/week columns become float64 (non-numeric and blank cells → 0), the
+# Corporates key is trimmed, and every coerced cell or key problem is counted
+# in a report. Downstream code can then sum columns directly.
+# ─────────────────────────────────────────────
+def value_cols(df: pd.DataFrame) -> list:
+    return [c for c in df.columns if c in MONTH_COLS or WEEK_COL_RE.match(str(c))]
+
+def normalize_sheet(name: str, df: pd.DataFrame) -> tuple:
+    """Return (clean frame, list of report rows) for one sheet."""
+    out    = df.copy()
+    issues = []
+
+    def note(column, issue, cells):
+        if cells:
+            issues.append({"Sheet": name, "Column": column, "Issue": issue, "Cells": int(cells)})
+
+    if KEY_COL not in out.columns:
+        raise ValueError(f"Sheet '{name}' has no '{KEY_COL}' column.")
+    key     = out[KEY_COL]
+    present = key.notna()
+    trimmed = key[present].astype(str).str.strip()
+    note(KEY_COL, "whitespace trimmed", (trimmed != key[present].astype(str)).sum())
+    out.loc[present, KEY_COL] = trimmed
+    note(KEY_COL, "missing key", (~present).sum() + (trimmed == "").sum())
+    note(KEY_COL, "duplicate key", out.loc[present, KEY_COL].duplicated().sum())
+
+    for c in value_cols(out):
+        raw = out[c]
+        num = pd.to_numeric(raw, errors="coerce")
+        note(c, "non-numeric → 0", (num.isna() & raw.notna()).sum())
+        note(c, "blank → 0", raw.isna().sum())
+        out[c] = num.fillna(0).astype("float64")
+    return out, issues
+
+def normalize_sheets(sheets: dict) -> tuple:
+    """Normalize all sheets; returns ({sheet: frame}, report frame)."""
+    clean, issues = {}, []
+    for name, df in sheets.items():
+        clean[name], found = normalize_sheet(name, df)
+        issues.extend(found)
+    return clean, pd.DataFrame(issues, columns=REPORT_COLS)
+
+# ─────────────────────────────────────────────
+# MEMORY LAYOUT
+#
+# The model's frames are held once per process, but each filter state keeps
+# row copies of them (apply_filters' take(), the weekly table), so their
+# width decides how many sessions a replica can serve. The dimension columns
+# are categorical, so a copy carries small integer codes instead of the
+# strings, and a value column is float32 when every value in it survives the
+# round trip exactly (whole amounts below 2**24 do; fractional targets stay
+# float64). The engine upcasts to float64 before summing, so every total is
+# the one the float64 layout gives. plain_frame() undoes the compaction, for
+# joins across frames and for the memory report.
+# ─────────────────────────────────────────────
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """`df` with categorical META_COLS and float32 value columns where that is exact."""
+    dtypes = {c: "category" for c in META_COLS if c in df.columns}
+    dtypes.update({c: "float32" for c in value_cols(df)
+                   if df[c].dtype == np.float64 and timeseries.fits_float32(df[c].to_numpy())})
+    return df.astype(dtypes)
+
+def plain(s: pd.Series) -> pd.Series:
+    """`s` in the uncompacted layout: categorical → its values' dtype, float32 → float64."""
+    if isinstance(s.dtype, pd.CategoricalDtype):   # a take from the categories; astype() goes through objects
+        values = s.cat.categories.array.take(s.cat.codes.to_numpy(), allow_fill=True)
+        return pd.Series(values, index=s.index, name=s.name)
+    return s.astype("float64") if s.dtype == np.float32 else s
+
+def plain_frame(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.astype({c: "float64" for c, dtype in df.dtypes.items() if dtype == np.float32})
+    for c, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            out[c] = plain(df[c])
+    return out
+
+def _held_bytes(df: pd.DataFrame, seen: set) -> int:
+    """Bytes of `df`, counting categories shared with an already-seen frame only once."""
+    total = int(df.index.memory_usage(deep=True))
+    for c in df.columns:
+        col = df[c]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            total += col.cat.codes.to_numpy().nbytes
+            if id(col.cat.categories) not in seen:
+                seen.add(id(col.cat.categories))
+                total += int(col.cat.categories.memory_usage(deep=True))
+        else:
+            total += int(col.memory_usage(deep=True, index=False))
+    return total
+
+def memory_report(frames: dict) -> pd.DataFrame:
+    """Bytes held per frame in the plain layout ("Before") and as stored ("After").
+
+    A take() of a categorical frame shares its categories, so those are
+    counted against the first frame listing them.
+    """
+    rows, seen = [], set()
+    for name, df in frames.items():
+        before = int(plain_frame(df).memory_usage(deep=True).sum())
+        after  = _held_bytes(df, seen)
+        rows.append({"Frame": name, "Rows": len(df), "Before (bytes)": before, "After (bytes)": after,
+                     "Saved %": round((1 - after / before) * 100, 1) if before else 0.0})
+    return pd.DataFrame(rows, columns=MEMORY_COLS)
+
+# ─────────────────────────────────────────────
+# DATA MODEL
+#
+# The long-format store is what the Parquet cache holds; in memory the model
+# keeps only `sheets`, each sheet pivoted back to the wide layout the engine
+# works on (non-value columns, then one column per period in time order),
+# compacted. Holding the store as well would keep every value twice, so it
+# is built when needed (series_store) and dropped again.
+# ─────────────────────────────────────────────
+@dataclass
+class DataModel:
+    """Normalized sheets for one workbook version. Frames are shared; treat as read-only."""
+    version: str
+    sheets:  dict
+    report:  pd.DataFrame
+    digests: dict = field(default=None, repr=False)
+
+    @property
+    def years(self) -> list:
+        """Year sheets, oldest first."""
+        return year_sheets(self.sheets)
+
+    @property
+    def year_pair(self) -> tuple:
+        """(comparison year, current year): the two latest year sheets."""
+        return tuple(self.years[-2:])
+
+    @property
+    def week_sheet(self) -> str:
+        return week_sheet(self.years[-1])
+
+    @property
+    def week_cols(self) -> list:
+        """The current year's week columns in time order, however many there are."""
+        return [c for c in self.sheets[self.week_sheet].columns if WEEK_COL_RE.match(str(c))]
+
+def _check_layout(names):
+    if TARGET_SHEET not in names:
+        raise ValueError(f"The workbook has no '{TARGET_SHEET}' sheet.")
+    if len(year_sheets(names)) < 2:
+        raise ValueError("The workbook needs at least two year sheets (e.g. '2025' and '2026').")
+
+def sheet_series(name: str, df: pd.DataFrame, current_year: str) -> timeseries.SheetSeries:
+    """The long-format values of one normalized sheet."""
+    week  = WEEK_SHEET_RE.match(name)
+    year  = week.group(1) if week else (current_year if name == TARGET_SHEET else name)
+    return timeseries.sheet_series(
+        df, value_cols(df), lambda c: "month" if c in MONTH_COLS else "week",
+        "target" if name == TARGET_SHEET else "revenue", int(year), KEY_COL)
+
+def series_store(model: "DataModel") -> timeseries.SeriesStore:
+    """The long-format store of `model`'s values, rebuilt from its wide sheets."""
+    current = model.years[-1]
+    return timeseries.SeriesStore({name: sheet_series(name, df, current)
+                                   for name, df in model.sheets.items()})
+
+def build_model(version: str, clean: dict, report: pd.DataFrame, digests: dict = None,
+                previous: DataModel = None) -> DataModel:
+    """Model from freshly normalized sheets; sheets not in `clean` are carried over from `previous`.
+
+    The current year's weekly sheet is added empty when the workbook has none yet.
+    """
+    names = sheet_order(clean) if previous is None else sheet_order(
+        set(clean) | {s for s in previous.sheets if s not in clean and (digests is None or s in digests["sheets"])})
+    _check_layout(names)
+    current = year_sheets(names)[-1]
+    if week_sheet(current) not in names:
+        clean = {**clean, week_sheet(current): pd.DataFrame({c: pd.Series(dtype="str") for c in META_COLS})}
+        names.append(week_sheet(current))
+    redate = previous is not None and previous.years[-1] != current   # Target moves to the new year
+    series, metas, sheets = {}, {}, {}
+    for name in names:
+        if name in clean or (name == TARGET_SHEET and redate):
+            df = clean[name] if name in clean else previous.sheets[name]
+            series[name] = sheet_series(name, df, current)
+            metas[name]  = compact_frame(df.drop(columns=value_cols(df)))
+        else:
+            sheets[name] = previous.sheets[name]
+    store = timeseries.SeriesStore(series)   # only to pivot the new sheets into time order
+    sheets.update({name: compact_frame(store.wide(name, meta)) for name, meta in metas.items()})
+    return DataModel(version, {name: sheets[name] for name in names}, report, digests)
+
+def load_model(path: str = DATA_FILE, version: str = None) -> DataModel:
+    """Return the normalized model, served from the Parquet cache when fresh.
+
+    An older `version` can only come from its cache: the workbook on disk now
+    holds different data, so it is not re-parsed under the old version.
+    """
+    current = data_version(path)
+    version = version or current
+    cached  = _read_cached(version)
+    if cached is not None:
+        if cached.digests is None:
+            cached.digests = workbook_digests(path)[0]
+        return cached
+    if version != current:
+        raise ValueError(f"Data version {version[:12]} is no longer cached and "
+                         f"{os.path.basename(path)} has changed since.")
+    digests, _ = workbook_digests(path)
+    model = build_model(version, *normalize_sheets(parse_workbook(path)), digests)
+    _write_cached(model)
+    return model
+
+# ─────────────────────────────────────────────
+# INCREMENTAL UPDATE
+#
+# A new workbook version is built from the previous model: only the sheets
+# whose digest changed are parsed and normalized, the rest are carried over
+# as the same (shared, read-only) frames. Each changed sheet is classified
+# against its previous frame so derived structures can be patched rather
+# than rebuilt — a weekly refresh typically appends one "week N" column.
+# ─────────────────────────────────────────────
+def sheet_delta(old: pd.DataFrame, new: pd.DataFrame) -> dict:
+    """How `new` differs from `old`: {"kind", "columns", "rows"}.
+
+    kind is "unchanged", "append_cols" (same rows, new columns after the old
+    ones), "append_rows" (same columns, old rows kept as a prefix) or "replace".
+    """
+    old, new = plain_frame(old), plain_frame(new)   # compare values, not categories / float widths
+    old_cols, new_cols = list(old.columns), list(new.columns)
+    if old_cols == new_cols and len(old) == len(new) and old.equals(new):
+        return {"kind": "unchanged", "columns": [], "rows": 0}
+    if (new_cols[:len(old_cols)] == old_cols and len(new_cols) > len(old_cols)
+            and len(old) == len(new) and new[old_cols].equals(old)):
+        return {"kind": "append_cols", "columns": new_cols[len(old_cols):], "rows": 0}
+    if old_cols == new_cols and len(new) > len(old) and new.iloc[:len(old)].equals(old):
+        return {"kind": "append_rows", "columns": [], "rows": len(new) - len(old)}
+    return {"kind": "replace", "columns": [], "rows": len(new)}
+
+def update_model(previous: DataModel, path: str = DATA_FILE, version: str = None) -> tuple:
+    """(new DataModel, {sheet: sheet_delta()}) for the workbook now at `path`.
+
+    Only the sheets that changed since `previous` are parsed; the returned
+    deltas cover exactly those sheets.
+    """
+    version = version or data_version(path)
+    digests, strings = workbook_digests(path)
+    changed = changed_sheets(previous.digests, digests, strings)
+    model   = _read_cached(version)
+    if model is not None:
+        changed = list(model.sheets) if changed is None else changed
+        for s in model.sheets:   # share the previous frames for what didn't change
+            if s not in changed and s in previous.sheets:
+                model.sheets[s] = previous.sheets[s]
+        model.digests = digests
+    else:
+        parsed = parse_workbook(path, changed) if changed != [] else {}
+        changed = list(parsed)
+        clean, report = normalize_sheets(parsed)
+        kept   = previous.report[~previous.report["Sheet"].isin(changed)]
+        report = pd.concat([r for r in (kept, report) if not r.empty] or [kept], ignore_index=True)
+        model  = build_model(version, clean, report, digests, previous)
+        order  = list(model.sheets)
+        model.report = (model.report[model.report["Sheet"].isin(order)]
+                        .sort_values("Sheet", key=lambda s: s.map(order.index), kind="stable", ignore_index=True))
+        _write_cached(model)
+    deltas = {s: (sheet_delta(previous.sheets[s], model.sheets[s]) if s in previous.sheets
+                  else {"kind": "replace", "columns": [], "rows": len(model.sheets[s])})
+              for s in model.sheets if s in changed or s not in previous.sheets}
+    deltas.update({s: {"kind": "removed", "columns": [], "rows": 0}
+                   for s in previous.sheets if s not in model.sheets})
+    return model, deltas
@@ -0,0 +1,648 @@
+import numpy as np
+import pandas as pd
+
+import data_store
+
+# ─────────────────────────────────────────────
+# RETENTION ENGINE
+#
+# Pure pandas computations behind the dashboard. Nothing here imports
+# Streamlit, so the same functions can be reused by scripts and caches.
+# All inputs are the normalized frames from data_store (numeric month/week
+# columns, trimmed Corporates key) and are never modified in place. Those
+# frames are compacted (categorical dimensions, float32 values where exact):
+# values are summed through values() in float64 and keys are joined plain.
+#
+# Years are never hard-coded: `years` is the (comparison, current) pair of
+# year sheet names, e.g. ("2025", "2026"), and doubles as the column labels
+# of those years' totals.
+# ─────────────────────────────────────────────
+KEY_COL        = "Corporates"
+ALL            = "All"
+FILTER_DIMS    = ("Corporates", "industry_", "Assignee_")
+CHURN_WINDOWS  = (30, 60, 90)
+TREND_WINDOWS  = (4, 8, 12)
+
+def latest_years(sheets: dict) -> tuple:
+    """The default (comparison, current) pair: the two latest year sheets."""
+    return tuple(data_store.year_sheets(sheets)[-2:])
+
+def values(df: pd.DataFrame, cols: list) -> pd.DataFrame:
+    """`df[cols]` as float64, so sums don't accumulate in float32."""
+    return df[cols].astype("float64")
+
+# ─────────────────────────────────────────────
+# FILTER INDEX
+#
+# Built once per data load. For every sheet it maps each Corporate, industry
+# and assignee value to the sorted row positions it selects. Industry and
+# assignee follow the Target sheet as master reference (a row matches when its
+# Corporate is listed under that value in Target), so corporates present in
+# the current year but missing metadata rows are not dropped. A filter
+# combination is the intersection of those positions followed by a single take().
+# ─────────────────────────────────────────────
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
+def _group_positions(keys: np.ndarray, positions: np.ndarray) -> dict:
+    """{key: sorted positions} — a vectorized groupby(...).indices."""
+    codes, uniques = pd.factorize(keys)
+    keep  = codes >= 0
+    codes, positions = codes[keep], positions[keep]
+    order = np.lexsort((positions, codes))
+    cuts  = np.cumsum(np.bincount(codes, minlength=len(uniques)))[:-1]
+    return dict(zip(uniques, np.split(positions[order], cuts)))
+
+def index_sheet(df: pd.DataFrame, master_df: pd.DataFrame) -> dict:
+    """{dimension: {value: sorted positions}} for one sheet."""
+    keys  = df[KEY_COL].to_numpy()
+    every = np.arange(len(df), dtype=np.intp)
+    entry = {KEY_COL: _group_positions(keys, every)}
+    for dim in FILTER_DIMS[1:]:
+        pairs = data_store.plain_frame(master_df[[KEY_COL, dim]]).dropna().drop_duplicates()
+        hits  = pd.DataFrame({KEY_COL: keys, "_pos": every}).merge(pairs, on=KEY_COL, how="inner")
+        hits  = hits.drop_duplicates([dim, "_pos"])
+        entry[dim] = _group_positions(hits[dim].to_numpy(), hits["_pos"].to_numpy())
+    return entry
+
+def build_filter_index(sheets: dict, master: str = "Target") -> dict:
+    """{dimension: {sheet: {value: sorted positions}}} for FILTER_DIMS."""
+    index = {dim: {} for dim in FILTER_DIMS}
+    for name, df in sheets.items():
+        for dim, entries in index_sheet(df, sheets[master]).items():
+            index[dim][name] = entries
+    return index
+
+def update_filter_index(index: dict, sheets: dict, deltas: dict, master: str = "Target") -> dict:
+    """Index for updated `sheets`, re-indexing only the sheets whose rows changed.
+
+    `deltas` are data_store.sheet_delta() results; appended columns leave
+    positions untouched. A change to the master sheet re-indexes everything.
+    """
+    rows_changed = [s for s, d in deltas.items() if d["kind"] in ("append_rows", "replace")]
+    if master in rows_changed:
+        return build_filter_index(sheets, master)
+    out = {dim: dict(per_sheet) for dim, per_sheet in index.items()}
+    for name in rows_changed:
+        for dim, entries in index_sheet(sheets[name], sheets[master]).items():
+            out[dim][name] = entries
+    return out
+
+def filter_positions(index: dict, sheet: str, selections: dict):
+    """Row positions in `sheet` matching every non-"All" selection, or None for all rows."""
+    pos = None
+    for dim, value in selections.items():
+        if value == ALL:
+            continue
+        hit = index[dim][sheet].get(value, _NO_ROWS)
+        pos = hit if pos is None else np.intersect1d(pos, hit, assume_unique=True)
+    return pos
+
+def apply_filters(sheets: dict, index: dict, corporate: str = ALL,
+                  industry: str = ALL, assignee: str = ALL) -> dict:
+    """Filtered view of every sheet. Unfiltered sheets are returned as-is (shared, read-only)."""
+    selections = {"Corporates": corporate, "industry_": industry, "Assignee_": assignee}
+    out = {}
+    for name, df in sheets.items():
+        pos = filter_positions(index, name, selections)
+        out[name] = df if pos is None else df.take(pos)
+    return out
+
+# ─────────────────────────────────────────────
+# GROWTH METRICS
+#
+# Whole-column replacements for the per-row lambdas: a zero denominator
+# yields 0.0 rather than inf/NaN, matching the dashboard's convention.
+# ─────────────────────────────────────────────
+def _safe_ratio(num, den) -> np.ndarray:
+    num = np.asarray(num, dtype="float64")
+    den = np.asarray(den, dtype="float64")
+    out = np.zeros(np.broadcast(num, den).shape)
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
+def pct_change(current, base) -> np.ndarray:
+    """(current - base) / base * 100 rounded to 1 dp; 0.0 where base is 0."""
+    current = np.asarray(current, dtype="float64")
+    return np.round(_safe_ratio(current - np.asarray(base, dtype="float64"), base) * 100, 1)
+
+def pct_of(part, whole) -> np.ndarray:
+    """part / whole * 100 rounded to 1 dp; 0.0 where whole is 0."""
+    return np.round(_safe_ratio(part, whole) * 100, 1)
+
+def fmt_pct(values) -> np.ndarray:
+    """Format percentages as '+x.x% 😍' / '-x.x% 🤬' / '0.0% 😐'."""
+    values = np.asarray(values, dtype="float64")
+    text   = np.char.mod("%+.1f%%", values)
+    return np.where(values > 0, np.char.add(text, " 😍"),
+           np.where(values < 0, np.char.add(text, " 🤬"), "0.0% 😐"))
+
+# ─────────────────────────────────────────────
+# WEEKLY TREND
+#
+# Ordinary least squares of revenue on week number (0, 1, 2, ...) for every
+# corporate at once. With x centred, slope = Y·xc / Σxc², so the whole
+# corporate × week matrix is fitted by one matrix-vector product.
+# ─────────────────────────────────────────────
+def trend_fit(values) -> tuple:
+    """Return (slope, intercept, r2) arrays for each row of a 2-D value matrix.
+
+    Rows with fewer than two points get zeros; R² is 0 for flat rows, which
+    have no variance for the line to explain.
+    """
+    y = np.asarray(values, dtype="float64")
+    n_rows, n_pts = y.shape
+    if n_pts < 2:
+        zeros = np.zeros(n_rows)
+        return zeros, zeros.copy(), zeros.copy()
+    xc     = np.arange(n_pts, dtype="float64") - (n_pts - 1) / 2
+    sxx    = xc @ xc
+    y_mean = y.mean(axis=1)
+    slope  = (y @ xc) / sxx
+    intercept = y_mean - slope * (n_pts - 1) / 2
+    ss_tot = np.square(y - y_mean[:, None]).sum(axis=1)
+    ss_res = np.clip(ss_tot - slope ** 2 * sxx, 0, None)
+    r2     = 1 - _safe_ratio(ss_res, ss_tot)
+    r2[ss_tot == 0] = 0.0
+    return slope, intercept, r2
+
+def trend_frame(week_df: pd.DataFrame, week_cols: list, window: int = None) -> pd.DataFrame:
+    """Trend Slope / Intercept / R² per row of `week_df`, over the last `window` weeks if given."""
+    cols = [w for w in week_cols if w in week_df.columns]
+    if window:
+        cols = cols[-window:]
+    slope, intercept, r2 = trend_fit(week_df[cols].to_numpy(dtype="float64"))
+    return pd.DataFrame({
+        "Trend Slope":     np.round(slope, 2),
+        "Trend Intercept": np.round(intercept, 2),
+        "Trend R²":        np.round(r2, 3),
+    }, index=week_df.index)
+
+# ─────────────────────────────────────────────
+# CHURN
+# ─────────────────────────────────────────────
+def churn_weeks(days: int, week_cols: list) -> list:
+    """Trailing week columns that make up a churn window of `days`."""
+    weeks_threshold = max(1, min(days // 7, len(week_cols)))
+    return week_cols[-weeks_threshold:]
+
+def _first_rows(df: pd.DataFrame) -> pd.DataFrame:
+    return df[df[KEY_COL].notna()].drop_duplicates(KEY_COL, keep="first")
+
+def _month_total(df: pd.DataFrame, month_cols: list) -> pd.Series:
+    return values(df, [m for m in month_cols if m in df.columns]).sum(axis=1)
+
+def churn_cols(years: tuple) -> list:
+    """Columns of the churn lists."""
+    return ["Corporate", "Industry", "Assignee", f"{years[0]} Total", "Target"]
+
+def build_churn_frame(target_df: pd.DataFrame, previous_df: pd.DataFrame,
+                      current_df: pd.DataFrame, week_df: pd.DataFrame,
+                      month_cols: list, week_cols: list, years: tuple,
+                      windows: tuple = CHURN_WINDOWS) -> pd.DataFrame:
+    """One row per churned comparison-year corporate with a flag column per churn definition.
+
+    `Inactive` marks corporates absent from the current year's sheet;
+    `Churned Nd` additionally includes corporates whose trailing weeks in the
+    window sum to zero. Industry/assignee and the comparison-year total come
+    from the corporate's first row in that year, the target from its first
+    Target row.
+    """
+    base = _first_rows(previous_df)
+    tgt  = _first_rows(target_df)
+    corp = base[KEY_COL]
+
+    out = pd.DataFrame({
+        "Corporate":           corp.to_numpy(),
+        "Industry":            base["industry_"].to_numpy() if "industry_" in base.columns else "—",
+        "Assignee":            base["Assignee_"].to_numpy() if "Assignee_" in base.columns else "—",
+        f"{years[0]} Total":   _month_total(base, month_cols).to_numpy(dtype="float64"),
+    })
+    target_totals = pd.Series(_month_total(tgt, month_cols).to_numpy(dtype="float64"),
+                              index=data_store.plain(tgt[KEY_COL]))
+    out["Target"] = out["Corporate"].map(target_totals).fillna(0.0)
+
+    inactive = ~out["Corporate"].isin(current_df[KEY_COL])
+    out["Inactive"] = inactive
+    flags = [inactive]
+    for days in windows:
+        existing = [c for c in churn_weeks(days, week_cols) if c in week_df.columns]
+        if existing and not week_df.empty:
+            zero_recent = week_df.loc[values(week_df, existing).sum(axis=1) == 0, KEY_COL]
+            flag = inactive | out["Corporate"].isin(zero_recent)
+        else:
+            flag = inactive
+        out[f"Churned {days}d"] = flag
+        flags.append(flag)
+
+    any_churn = pd.concat(flags, axis=1).any(axis=1)
+    return out[any_churn].reset_index(drop=True)
+
+def _churn_list(churn_df: pd.DataFrame, flag: str) -> pd.DataFrame:
+    cols = [c for c in churn_df.columns if c != "Inactive" and not c.startswith("Churned ")]
+    return churn_df.loc[churn_df[flag], cols].reset_index(drop=True)
+
+def churned_for_period(churn_df: pd.DataFrame, days: int) -> pd.DataFrame:
+    """Corporates churned within `days` (not in the current year or zero trailing weeks)."""
+    view = _churn_list(churn_df, f"Churned {days}d")
+    view["Churn Period"] = f"{days} days"
+    return view
+
+def churned_global(churn_df: pd.DataFrame) -> pd.DataFrame:
+    """Corporates active in the comparison year with no row in the current year's sheet."""
+    return _churn_list(churn_df, "Inactive")
+
+# ─────────────────────────────────────────────
+# BOT CONTEXT
+#
+# The Retention Bot prompt is assembled from independent text sections so
+# callers can cache each one against the inputs it depends on: the churn,
+# YoY and weekly sections depend only on the loaded workbook, the totals and
+# group sections on the current filter state. Lookups are joins on the
+# first row per corporate instead of per-corporate scans.
+# ─────────────────────────────────────────────
+def _meta_lookup(target_df: pd.DataFrame, corps: pd.Series) -> tuple:
+    """(industry, assignee) arrays for `corps` from the first Target row, '—' when absent."""
+    meta  = _first_rows(target_df).set_index(KEY_COL)
+    known = corps.isin(meta.index).to_numpy()
+    ind   = np.where(known, corps.map(meta["industry_"]).to_numpy(dtype=object), "—")
+    asn   = np.where(known, corps.map(meta["Assignee_"]).to_numpy(dtype=object), "—")
+    return ind, asn
+
+def context_churn_section(previous_df: pd.DataFrame, current_df: pd.DataFrame, years: tuple) -> str:
+    prev, cur   = years
+    active_set  = set(current_df[KEY_COL])
+    churned_set = set(previous_df[KEY_COL]) - active_set
+    lines = [f"Active corporates in {cur}: {len(active_set)}",
+             f"Churned (in {prev} but not {cur}): {len(churned_set)}"]
+    if churned_set:
+        lines.append("Churned list: " + ", ".join(sorted(churned_set)[:40]))
+    return "\n".join(lines)
+
+def context_yoy_section(target_df: pd.DataFrame, previous_df: pd.DataFrame,
+                        current_df: pd.DataFrame, month_cols: list, years: tuple) -> str:
+    prev, cur = years
+    months = [m for m in month_cols if m in current_df.columns]
+    r26, r25 = _first_rows(current_df), _first_rows(previous_df)
+    v26 = pd.Series(_month_total(r26, months).to_numpy(dtype="float64"), index=data_store.plain(r26[KEY_COL]))
+    v25 = pd.Series(_month_total(r25, months).to_numpy(dtype="float64"), index=data_store.plain(r25[KEY_COL]))
+    yoy = pd.DataFrame({"v26": v26, "v25": v25}).fillna(0.0)
+    yoy.index.name = KEY_COL
+    yoy = yoy.reset_index()
+    yoy["pct"] = pct_change(yoy["v26"], yoy["v25"])
+    yoy["ind"], yoy["asn"] = _meta_lookup(target_df, yoy[KEY_COL])
+    yoy = yoy.sort_values(["pct", KEY_COL], kind="stable")
+    lines = ["\n=== YoY per corporate ==="]
+    lines += [f"  {corp}: {prev}={v25:,.0f}, {cur}={v26:,.0f}, YoY={pct:+.1f}%, Industry={ind}, Assignee={asn}"
+              for corp, v25, v26, pct, ind, asn in
+              zip(yoy[KEY_COL], yoy["v25"], yoy["v26"], yoy["pct"], yoy["ind"], yoy["asn"])]
+    return "\n".join(lines)
+
+def context_weekly_section(target_df: pd.DataFrame, week_df: pd.DataFrame, week_cols: list) -> str:
+    lines = ["\n=== Weekly data ==="]
+    present = [c for c in week_cols if c in week_df.columns]
+    if len(present) >= 2:
+        half   = len(present) // 2
+        values = week_df[present].to_numpy(dtype="float64")
+        trend  = pct_change(values[:, half:].sum(axis=1), values[:, :half].sum(axis=1))
+        ind, asn = _meta_lookup(target_df, week_df[KEY_COL])
+        wvals  = np.char.mod("%.0f", values)
+        lines += [f"  {corp}: weeks=[{', '.join(w)}], trend={t:+.1f}%, Assignee={a}, Industry={i}"
+                  for corp, w, t, a, i in zip(week_df[KEY_COL], wvals, trend, asn, ind)]
+    return "\n".join(lines)
+
+def context_totals_section(total_target: float, total_current: float, total_previous: float,
+                           shortfall: float, growth_vs_target: float, growth_vs_previous: float,
+                           years: tuple) -> str:
+    prev, cur = years
+    return "\n".join([
+        "\n=== Totals ===",
+        f"Total target: {total_target:,.0f}",
+        f"Total {cur}:   {total_current:,.0f}",
+        f"Total {prev}:   {total_previous:,.0f}",
+        f"Shortfall:    {shortfall:,.0f}",
+        f"Growth vs target: {growth_vs_target:+.1f}%",
+        f"Growth vs {prev}:   {growth_vs_previous:+.1f}%",
+    ])
+
+def context_group_section(merged: pd.DataFrame, dim: str, title: str, years: tuple) -> str:
+    prev, cur = years
+    grp = merged.groupby(dim)[[prev, cur]].sum()
+    pct = pct_change(grp[cur], grp[prev])
+    lines = [f"\n=== {title} performance ==="]
+    lines += [f"  {name}: {prev}={v25:,.0f}, {cur}={v26:,.0f}, YoY={p:+.1f}%"
+              for name, v25, v26, p in zip(grp.index, grp[prev], grp[cur], pct)]
+    return "\n".join(lines)
+
+# ─────────────────────────────────────────────
+# DASHBOARD STATE  ←  AGGREGATION (THE CORE FIX)
+#
+# PROBLEM: Old code intersected corporates across all 3 sheets, so any
+# corporate missing from even one sheet was silently dropped — causing
+# totals to be lower than the Excel sheet totals.
+#
+# FIX: Sum each sheet independently, then outer-join the results.
+# Every corporate from every sheet is preserved; missing values → 0.
+# KPI totals come directly from the filtered sheet sums, not from any join.
+#
+# compute_dashboard() is a pure function of (sheets, filter selections), so
+# the app can share one result per filter combination across all sessions.
+# ─────────────────────────────────────────────
+def sum_months(df: pd.DataFrame, month_cols: list, label: str) -> pd.DataFrame:
+    """Return a Corporates + label dataframe with numeric month sums."""
+    cols = [m for m in month_cols if m in df.columns]
+    return pd.DataFrame({KEY_COL: data_store.plain(df[KEY_COL]), label: values(df, cols).sum(axis=1)})
+
+def build_merged(totals_current: pd.DataFrame, totals_previous: pd.DataFrame, totals_target: pd.DataFrame,
+                 target_df: pd.DataFrame, previous_df: pd.DataFrame, years: tuple) -> pd.DataFrame:
+    """Outer-join the per-sheet totals and attach industry/assignee and growth %."""
+    prev, cur = years
+    merged = (
+        totals_current
+        .merge(totals_previous, on=KEY_COL, how="outer")
+        .merge(totals_target, on=KEY_COL, how="outer")
+        .fillna(0)
+    )
+    # Attach industry / assignee metadata (target sheet is master; comparison year as fallback)
+    meta = (
+        data_store.plain_frame(target_df[[KEY_COL, "industry_", "Assignee_"]])
+        .drop_duplicates(KEY_COL)
+    )
+    meta_prev = (
+        data_store.plain_frame(previous_df[[KEY_COL, "industry_", "Assignee_"]])
+        .drop_duplicates(KEY_COL)
+        .rename(columns={"industry_": "ind_prev", "Assignee_": "asn_prev"})
+    )
+    merged = merged.merge(meta, on=KEY_COL, how="left")
+    merged = merged.merge(meta_prev, on=KEY_COL, how="left")
+    merged["industry_"] = merged["industry_"].fillna(merged["ind_prev"]).fillna("—")
+    merged["Assignee_"] = merged["Assignee_"].fillna(merged["asn_prev"]).fillna("—")
+    return add_growth(merged.drop(columns=["ind_prev", "asn_prev"]), years)
+
+def add_growth(merged: pd.DataFrame, years: tuple) -> pd.DataFrame:
+    """Append the "% vs <comparison year>" and "% vs Target" columns to a merged frame."""
+    prev, cur = years
+    merged[f"% vs {prev}"] = pct_change(merged[cur], merged[prev])
+    merged["% vs Target"]  = pct_change(merged[cur], merged["Target"])
+    return merged
+
+def growth_pct(current: float, base: float) -> float:
+    return round((current - base) / base * 100, 1) if base != 0 else 0.0
+
+def compute_dashboard(sheets: dict, index: dict, corporate: str = ALL, industry: str = ALL,
+                      assignee: str = ALL, month: str = ALL, month_cols: list = data_store.MONTH_COLS,
+                      cube: dict = None, years: tuple = None) -> dict:
+    """Everything the dashboard derives from one filter combination.
+
+    With a `cube` (build_cube), KPI totals and the monthly/assignee/industry
+    aggregates are sliced from it instead of re-summing the filtered rows.
+    `years` defaults to latest_years(sheets).
+    Returned frames are shared between sessions and must not be modified.
+    """
+    filtered = apply_filters(sheets, index, corporate, industry, assignee)
+    summary  = None if cube is None else slice_cube(cube, corporate, industry, assignee, month)
+    return aggregate_dashboard(sheets, filtered, month, month_cols, summary, years)
+
+def aggregate_dashboard(sheets: dict, filtered: dict, month: str = ALL, month_cols: list = data_store.MONTH_COLS,
+                        summary: dict = None, years: tuple = None) -> dict:
+    """compute_dashboard() for sheets already filtered by apply_filters().
+
+    `summary` is the slice_cube() result for the same filters and years, if available.
+    """
+    prev, cur = years = tuple(years or latest_years(sheets))
+    available = [m for m in month_cols if m in sheets[cur].columns]
+    months    = available if month == ALL else [month]
+    f_target, f_prev, f_cur = filtered["Target"], filtered[prev], filtered[cur]
+
+    totals_cur    = sum_months(f_cur,    months, cur)
+    totals_prev   = sum_months(f_prev,   months, prev)
+    totals_target = sum_months(f_target, months, "Target")
+    merged = build_merged(totals_cur, totals_prev, totals_target, sheets["Target"], sheets[prev], years)
+    if summary is None:
+        summary = summarize_frames(filtered, merged, months, years)
+    return dashboard_state(years, filtered, months, merged, summary)
+
+def dashboard_state(years: tuple, filtered: dict, months: list, merged: pd.DataFrame, summary: dict) -> dict:
+    """The compute_dashboard() result from its parts, however they were computed."""
+    prev, cur = years
+    vs_prev  = f"% vs {prev}"
+    yoy_show = merged[[KEY_COL, vs_prev, cur]]
+    yoy = (pd.concat([yoy_show.nlargest(10, vs_prev), yoy_show.nsmallest(10, vs_prev)])
+           .drop_duplicates().sort_values(vs_prev, ascending=True))
+
+    total_cur, total_prev, total_target = summary["total_current"], summary["total_previous"], summary["total_target"]
+    return {
+        "years":              years,
+        "filtered":           filtered,
+        "months":             months,
+        "merged":             merged,
+        "total_current":      total_cur,
+        "total_previous":     total_prev,
+        "total_target":       total_target,
+        "shortfall":          total_target - total_cur,
+        "active_corps":       summary["active_corps"],
+        "growth_vs_target":   growth_pct(total_cur, total_target),
+        "growth_vs_previous": growth_pct(total_cur, total_prev),
+        "monthly":            summary["monthly"],
+        "agg_asn":            summary["agg_asn"],
+        "agg_ind":            summary["agg_ind"],
+        "yoy":                yoy,
+        "attain":             summary["attain"],
+    }
+
+def _group_aggregates(groups: pd.DataFrame, cur: str) -> tuple:
+    """(agg_asn, agg_ind, attain) from rows carrying industry_, Assignee_, Target and the current year."""
+    agg_asn = (
+        groups.groupby("Assignee_")[cur].sum()
+        .reset_index().rename(columns={"Assignee_": "Assignee"})
+        .sort_values(cur, ascending=False)
+    )
+    agg_ind = (
+        groups.groupby("industry_")[cur].sum()
+        .reset_index().rename(columns={"industry_": "Industry"})
+        .sort_values(cur, ascending=True)
+    )
+    attain = (
+        groups.groupby("Assignee_")[["Target", cur]].sum()
+        .reset_index().rename(columns={"Assignee_": "Assignee", cur: f"Revenue {cur}"})
+    )
+    attain["Attainment %"] = pct_of(attain[f"Revenue {cur}"], attain["Target"])
+    return agg_asn, agg_ind, attain
+
+def summarize_frames(filtered: dict, merged: pd.DataFrame, months: list, years: tuple) -> dict:
+    """KPI totals and aggregates summed from the filtered rows and merged frame."""
+    prev, cur = years
+    f_target, f_prev, f_cur = filtered["Target"], filtered[prev], filtered[cur]
+
+    # ── KPI TOTALS: sum directly from each filtered sheet — no join filtering ──
+    def col_sum(df, col):
+        return df[col].astype("float64").sum() if col in df.columns else 0.0
+    def total(df):
+        return values(df, [m for m in months if m in df.columns]).sum(axis=1).sum()
+
+    # Monthly aggregation — sum directly from each filtered sheet, per month
+    monthly = pd.DataFrame([{
+        "Month":  m,
+        "Target": col_sum(f_target, m),
+        prev:     col_sum(f_prev,   m),
+        cur:      col_sum(f_cur,    m),
+    } for m in months], columns=["Month", "Target", prev, cur])
+    agg_asn, agg_ind, attain = _group_aggregates(merged, cur)
+    return {
+        "total_current":  total(f_cur),
+        "total_previous": total(f_prev),
+        "total_target":   total(f_target),
+        "active_corps":   f_cur[KEY_COL].nunique(),
+        "monthly":      monthly,
+        "agg_asn":      agg_asn,
+        "agg_ind":      agg_ind,
+        "attain":       attain,
+    }
+
+# ─────────────────────────────────────────────
+# SUMMARY CUBE
+#
+# Built once per data load (and year pair): Target, comparison-year and
+# current-year month sums per cell, where a
+# cell groups corporates with the same Target-sheet industry and assignee
+# memberships (what the filters match on) and the same displayed
+# industry/assignee (what the charts group by) — in practice one cell per
+# industry × assignee pair. Per-corporate month sums are kept as leaves for
+# the Corporate filter. A filter combination then sums a handful of cell
+# rows, so KPI totals, the monthly chart and the assignee/industry/attainment
+# aggregates cost the same regardless of how many corporates there are.
+# Rows without a Corporates key only count towards the unfiltered totals.
+# ─────────────────────────────────────────────
+def cube_sheets(years: tuple) -> tuple:
+    """The sheets a cube for `years` is built from."""
+    return ("Target",) + tuple(years)
+
+MEMBER_SEP = "\x1f"
+
+def _memberships(target_df: pd.DataFrame, dim: str, corps: pd.Index) -> np.ndarray:
+    """Per corporate, the sorted `dim` values it is listed under in Target, joined by MEMBER_SEP."""
+    pairs = data_store.plain_frame(target_df[[KEY_COL, dim]]).dropna().drop_duplicates().sort_values([KEY_COL, dim])
+    multi = pairs[KEY_COL].duplicated(keep=False)
+    found = pairs.loc[~multi].set_index(KEY_COL)[dim]
+    if multi.any():   # rare: a corporate listed under several values
+        found = pd.concat([found, pairs.loc[multi].groupby(KEY_COL)[dim].agg(MEMBER_SEP.join)])
+    return found.reindex(corps).fillna("").to_numpy(dtype=object)
+
+def build_cube(sheets: dict, month_cols: list, years: tuple = None, master: str = "Target") -> dict:
+    prev, cur = years = tuple(years or latest_years(sheets))
+    target = sheets[master]
+    corps  = pd.Index(pd.concat([data_store.plain(sheets[s][KEY_COL]) for s in cube_sheets(years)]).dropna().unique())
+
+    # Displayed industry / assignee, exactly as build_merged() attaches them
+    meta      = data_store.plain_frame(target[[KEY_COL, "industry_", "Assignee_"]]).drop_duplicates(KEY_COL).set_index(KEY_COL)
+    meta_prev = data_store.plain_frame(sheets[prev][[KEY_COL, "industry_", "Assignee_"]]).drop_duplicates(KEY_COL).set_index(KEY_COL)
+    info = pd.DataFrame({
+        "ind_set":   _memberships(target, "industry_", corps),
+        "asn_set":   _memberships(target, "Assignee_", corps),
+        "industry_": meta["industry_"].reindex(corps).fillna(meta_prev["industry_"].reindex(corps)).fillna("—").to_numpy(),
+        "Assignee_": meta["Assignee_"].reindex(corps).fillna(meta_prev["Assignee_"].reindex(corps)).fillna("—").to_numpy(),
+    })
+    corp_cell = info.groupby(["ind_set", "asn_set", "industry_", "Assignee_"], sort=False).ngroup().to_numpy()
+    cells     = info.groupby(corp_cell, sort=True).first().reset_index(drop=True)
+
+    leaves, sums, unkeyed = {}, {}, {}
+    for label in cube_sheets(years):
+        present = [m for m in month_cols if m in sheets[label].columns]
+        df      = data_store.plain_frame(sheets[label][[KEY_COL] + present])
+        keyed   = df[KEY_COL].notna()
+        leaf    = (df.loc[keyed].groupby(KEY_COL, sort=False)[present].sum()
+                   .reindex(index=corps, columns=month_cols, fill_value=0.0))
+        leaves[label]  = leaf
+        sums[label]    = leaf.groupby(corp_cell, sort=True).sum().to_numpy()
+        unkeyed[label] = df.loc[~keyed, present].reindex(columns=month_cols, fill_value=0.0).sum().to_numpy()
+
+    in_current = np.zeros(len(corps), dtype=bool)
+    in_current[corps.get_indexer(data_store.plain(sheets[cur][KEY_COL]).dropna().unique())] = True
+    groups  = {dim: pd.factorize(cells[dim], sort=True) for dim in ("industry_", "Assignee_")}
+    by_value = {}
+    for dim, col in (("industry_", "ind_set"), ("Assignee_", "asn_set")):
+        listed = cells[col].str.split(MEMBER_SEP).explode()
+        listed = listed[listed != ""]
+        ids    = listed.index.to_numpy()
+        by_value[dim] = {k: ids[v] for k, v in listed.groupby(listed, sort=False).indices.items()}
+    return {
+        "years":     years,
+        "months":    list(month_cols),
+        "available": [m for m in month_cols if m in sheets[cur].columns],
+        "corps":     pd.Series(np.arange(len(corps)), index=corps),
+        "corp_cell": corp_cell,
+        "cells":     cells[["industry_", "Assignee_"]],
+        "groups":    groups,
+        "by_value":  by_value,
+        "leaves":    leaves,
+        "sums":      sums,
+        "unkeyed":   unkeyed,
+        "active":     np.bincount(corp_cell[in_current], minlength=len(cells)),
+        "in_current": in_current,
+    }
+
+def _cube_cells(cube: dict, industry: str, assignee: str):
+    """Cell ids matching the industry/assignee selections, or None for every cell."""
+    ids = None
+    for dim, value in (("industry_", industry), ("Assignee_", assignee)):
+        if value == ALL:
+            continue
+        hit = cube["by_value"][dim].get(value, _NO_ROWS)
+        ids = hit if ids is None else np.intersect1d(ids, hit, assume_unique=True)
+    return ids
+
+def slice_cube(cube: dict, corporate: str = ALL, industry: str = ALL,
+               assignee: str = ALL, month: str = ALL) -> dict:
+    """The summarize_frames() result for one filter combination, read from the cube."""
+    prev, cur = cube["years"]
+    labels = cube_sheets(cube["years"])
+    months = cube["available"] if month == ALL else [month]
+    cols   = [cube["months"].index(m) for m in months]
+    ids    = _cube_cells(cube, industry, assignee)
+
+    if corporate != ALL:
+        pos  = cube["corps"].get(corporate)
+        cell = None if pos is None else cube["corp_cell"][pos]
+        if cell is None or (ids is not None and cell not in ids):
+            rows, cell_ids, active = {label: np.zeros((0, len(cols))) for label in labels}, [], 0
+        else:
+            rows     = {label: cube["leaves"][label].iloc[[pos], cols].to_numpy() for label in labels}
+            cell_ids = [cell]
+            active   = int(cube["in_current"][pos])
+        extra = None
+    else:
+        cell_ids = np.arange(len(cube["cells"])) if ids is None else ids
+        rows     = {label: cube["sums"][label][cell_ids][:, cols] for label in labels}
+        active   = int(cube["active"][cell_ids].sum())
+        extra    = cube["unkeyed"] if ids is None else None
+
+    by_month = {label: rows[label].sum(axis=0) for label in labels}
+    if extra is not None:
+        by_month = {label: by_month[label] + extra[label][cols] for label in by_month}
+    monthly = pd.DataFrame({"Month": months, **{label: by_month[label] for label in labels}})
+
+    target_by_cell  = rows["Target"].sum(axis=1)
+    revenue_by_cell = rows[cur].sum(axis=1)
+
+    def by_group(dim, weights):
+        codes, labels = cube["groups"][dim]
+        codes   = codes[cell_ids]
+        present = np.unique(codes)
+        return labels[present], np.bincount(codes, weights, minlength=len(labels))[present]
+
+    asn, asn_rev = by_group("Assignee_", revenue_by_cell)
+    ind, ind_rev = by_group("industry_", revenue_by_cell)
+    _,   asn_tgt = by_group("Assignee_", target_by_cell)
+    agg_asn = pd.DataFrame({"Assignee": asn, cur: asn_rev}).sort_values(cur, ascending=False)
+    agg_ind = pd.DataFrame({"Industry": ind, cur: ind_rev}).sort_values(cur, ascending=True)
+    attain  = pd.DataFrame({"Assignee": asn, "Target": asn_tgt, f"Revenue {cur}": asn_rev})
+    attain["Attainment %"] = pct_of(attain[f"Revenue {cur}"], attain["Target"])
+    return {
+        "total_current":  by_month[cur].sum(),
+        "total_previous": by_month[prev].sum(),
+        "total_target":   by_month["Target"].sum(),
+        "active_corps":   active,
+        "monthly":      monthly,
+        "agg_asn":      agg_asn,
+        "agg_ind":      agg_ind,
+        "attain":       attain,
+    }
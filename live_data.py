@@ -0,0 +1,149 @@
+import os
+import time
+import threading
+from dataclasses import dataclass, field
+from collections import OrderedDict
+
+import data_store
+import engine
+
+# ─────────────────────────────────────────────
+# LIVE DATA
+#
+# Process-wide owner of the loaded workbook. A daemon thread polls data.xlsx
+# (size/mtime via data_store.data_version's manifest) and, when it changes,
+# builds the next snapshot off to the side from the previous one: only the
+# changed sheets are parsed (data_store.update_model), and the filter index
+# and summary cube are patched or carried over according to what changed.
+# The finished snapshot is then published with a single reference swap, so
+# a rerun that reads current() sees either the old version or the new one in
+# full — never a half-built model — and switches over without a cold load.
+# A failed reload (e.g. the file is mid-save) keeps the last good snapshot;
+# it is retried on the next poll only once the file has changed again, so a
+# broken workbook is parsed once rather than every POLL_SECS. Publishing also
+# deletes the cache directories (Parquet files, SQL database, exports) of
+# versions that fell out of the KEEP window.
+# ─────────────────────────────────────────────
+POLL_SECS = 2.0
+KEEP      = 3     # snapshots kept for reruns that started on an older version
+
+@dataclass
+class Snapshot:
+    """One published data version and the structures derived from it. Read-only."""
+    version:   str
+    model:     data_store.DataModel
+    index:     dict
+    cube:      dict
+    loaded_at: float = field(default_factory=time.time)
+    deltas:    dict = field(default_factory=dict)   # sheet → data_store.sheet_delta(), vs the previous version
+
+def build_snapshot(model: data_store.DataModel, deltas: dict = None) -> Snapshot:
+    return Snapshot(model.version, model, engine.build_filter_index(model.sheets),
+                    engine.build_cube(model.sheets, data_store.MONTH_COLS, model.year_pair),
+                    deltas=deltas or {})
+
+def next_snapshot(previous: Snapshot, model: data_store.DataModel, deltas: dict) -> Snapshot:
+    """Derive `model`'s snapshot from the previous one, reusing what the deltas leave intact."""
+    changed = {s: d for s, d in deltas.items() if d["kind"] != "unchanged"}
+    if list(model.sheets) != list(previous.model.sheets):   # a sheet (e.g. a new year) came or went
+        return build_snapshot(model, changed)
+    index   = engine.update_filter_index(previous.index, model.sheets, changed)
+    if any(s in changed for s in engine.cube_sheets(model.year_pair)):
+        cube = engine.build_cube(model.sheets, data_store.MONTH_COLS, model.year_pair)
+    else:
+        cube = previous.cube
+    return Snapshot(model.version, model, index, cube, deltas=changed)
+
+def describe_deltas(deltas: dict) -> str:
+    """One-line summary of what changed in a snapshot, for the admin panel."""
+    if not deltas:
+        return "initial load"
+    parts = []
+    for sheet, d in deltas.items():
+        if d["kind"] == "append_cols":
+            parts.append(f"{sheet}: +{len(d['columns'])} column(s) ({', '.join(map(str, d['columns']))})")
+        elif d["kind"] == "append_rows":
+            parts.append(f"{sheet}: +{d['rows']} row(s)")
+        elif d["kind"] == "removed":
+            parts.append(f"{sheet}: removed")
+        else:
+            parts.append(f"{sheet}: reloaded")
+    return "; ".join(parts)
+
+class LiveData:
+    def __init__(self, path: str = data_store.DATA_FILE, poll_secs: float = POLL_SECS):
+        self.path       = path
+        self.poll_secs  = poll_secs
+        self.last_error = None
+        self._lock      = threading.Lock()
+        self._reload    = threading.Lock()
+        self._snapshots = OrderedDict()
+        self._current   = None
+        self._failed    = None   # data_version that last failed to load; skipped until the file changes
+        self._publish(build_snapshot(data_store.load_model(path, data_store.data_version(path))))
+        self._thread = None
+
+    def _keep(self, snap: Snapshot):
+        # Caller holds _lock.
+        self._snapshots[snap.version] = snap
+        self._snapshots.move_to_end(snap.version)
+        while len(self._snapshots) > KEEP:
+            self._snapshots.popitem(last=False)
+
+    def _publish(self, snap: Snapshot):
+        with self._lock:
+            self._keep(snap)
+            self._current = snap
+            versions = list(self._snapshots)
+        data_store.prune_cache(versions)
+
+    def current(self) -> Snapshot:
+        return self._current
+
+    def snapshot(self, version: str) -> Snapshot:
+        """The snapshot for `version`; rebuilt from its Parquet cache if still on disk.
+
+        Raises ValueError when that cache is gone too and the workbook has
+        moved on (see data_store.load_model) — the caller should rerun on current().
+        """
+        with self._lock:
+            snap = self._snapshots.get(version)
+        if snap is None:
+            snap = build_snapshot(data_store.load_model(self.path, version))
+            with self._lock:
+                if version in self._snapshots:   # rebuilt by another thread meanwhile
+                    return self._snapshots[version]
+                self._keep(snap)
+        return snap
+
+    def refresh(self) -> bool:
+        """Load and publish the workbook if it changed; True when a new version was published."""
+        with self._reload:
+            version = None
+            try:
+                version = data_store.data_version(self.path)
+                current = self._current
+                if version == current.version or version == self._failed:
+                    return False
+                model, deltas = data_store.update_model(current.model, self.path, version)
+                self._publish(next_snapshot(current, model, deltas))
+                self.last_error = None
+                self._failed    = None
+                return True
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._failed    = version   # None when the file couldn't be read at all: retry
+                return False
+
+    def start(self):
+        """Begin polling in a daemon thread (idempotent)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="data-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_secs)
+            if os.path.exists(self.path):
+                self.refresh()
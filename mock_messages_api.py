@@ -0,0 +1,128 @@
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ─────────────────────────────────────────────
+# MOCK MESSAGES API
+#
+# Local stand-in for POST /v1/messages so the Retention Bot can be exercised
+# offline. Point the app at it with ANTHROPIC_BASE_URL = "http://127.0.0.1:8765"
+# (any key starting with "sk-" is accepted) or start it in-process with
+# start_mock_server(). The reply echoes the last user message, word by word
+# when streaming. Directives in the user message drive the other paths:
+#
+#   [[status:529]]     respond with that HTTP status and an error body
+#   [[stream-error]]   send an SSE error event after the first few tokens
+#   [[truncate]]       close the stream after the first few tokens, without message_stop
+#   [[delay:0.5]]      sleep this many seconds between streamed tokens
+#   [[fail-first:2]]   answer 529 (with Retry-After: 0) to the first N requests
+#                      carrying this message, then succeed
+# ─────────────────────────────────────────────
+DIRECTIVE_RE = re.compile(r"\[\[(status|stream-error|truncate|delay|fail-first)(?::([\d.]+))?\]\]")
+
+def _reply_for(text: str) -> str:
+    return "Mock answer to: " + DIRECTIVE_RE.sub("", text).strip()
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    token_delay      = 0.0
+    failures_seen    = {}
+    lock             = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, status: int, body: dict, headers: dict = None):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _sse(self, event: str, body: dict):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(body)}\n\n".encode())
+        self.wfile.flush()
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/messages":
+            return self._json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.headers.get("x-api-key", "").startswith("sk-"):
+            return self._json(401, {"type": "error", "error": {"type": "authentication_error", "message": "invalid x-api-key"}})
+
+        question   = body.get("messages", [{}])[-1].get("content", "")
+        directives = {k: v for k, v in DIRECTIVE_RE.findall(question)}
+        if "status" in directives:
+            status = int(float(directives["status"]))
+            return self._json(status, {"type": "error", "error": {"type": "mock_error", "message": f"mock status {status}"}})
+        if "fail-first" in directives:
+            with self.lock:
+                seen = self.failures_seen.get(question, 0)
+                self.failures_seen[question] = seen + 1
+            if seen < int(float(directives["fail-first"])):
+                return self._json(529, {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}},
+                                  {"Retry-After": "0"})
+
+        answer = _reply_for(question)
+        if not body.get("stream"):
+            return self._json(200, {"type": "message", "role": "assistant", "model": body.get("model"),
+                                    "content": [{"type": "text", "text": answer}],
+                                    "stop_reason": "end_turn"})
+
+        delay = float(directives.get("delay") or self.token_delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            self._sse("message_start", {"type": "message_start", "message": {"role": "assistant", "content": []}})
+            self._sse("content_block_start", {"type": "content_block_start", "index": 0,
+                                              "content_block": {"type": "text", "text": ""}})
+            for i, token in enumerate(re.findall(r"\S+\s*", answer)):
+                if "stream-error" in directives and i == 3:
+                    self._sse("error", {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}})
+                    return
+                if "truncate" in directives and i == 3:
+                    return   # connection closes mid-message, as a dropped proxy would
+                self._sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                  "delta": {"type": "text_delta", "text": token}})
+                time.sleep(delay)
+            self._sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+            self._sse("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn"}})
+            self._sse("message_stop", {"type": "message_stop"})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client cancelled
+
+def start_mock_server(port: int = 0, token_delay: float = 0.0) -> tuple:
+    """Serve in a daemon thread; returns (server, base_url). Call server.shutdown() to stop."""
+    handler = type("Handler", (MockHandler,), {"token_delay": token_delay, "failures_seen": {},
+                                               "lock": threading.Lock()})
+    server  = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock of the Anthropic Messages API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token-delay", type=float, default=0.05,
+                        help="seconds between streamed tokens")
+    args = parser.parse_args(argv)
+    server, url = start_mock_server(args.port, args.token_delay)
+    print(f"Mock Messages API listening on {url}", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# ─────────────────────────────────────────────
+# STAGE TIMINGS
+#
+# Process-wide timings for the main sections of a dashboard rerun (data load,
+# filters, aggregation, churn, each chart, weekly trend, bot context, bot
+# HTTP call). Each stage keeps its most recent samples in a ring buffer, so
+# memory is bounded and the summary reflects current behaviour. Recording is
+# a perf_counter pair and a deque append under a lock; safe to call from the
+# bot worker threads. Samples can optionally be appended to a JSON-lines file
+# for offline analysis — outside the lock, one write() per line in append
+# mode, so no stage waits on another thread's disk I/O.
+# ─────────────────────────────────────────────
+MAX_SAMPLES = 500
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+class StageTimer:
+    def __init__(self, max_samples: int = MAX_SAMPLES, log_path: str = None):
+        self.max_samples = max_samples
+        self.log_path    = log_path
+        self._lock       = threading.Lock()
+        self._stages     = {}
+
+    def record(self, name: str, seconds: float):
+        sample = {"ts": time.time(), "stage": name, "seconds": seconds}
+        with self._lock:
+            buf = self._stages.get(name)
+            if buf is None:
+                buf = self._stages[name] = deque(maxlen=self.max_samples)
+            buf.append(sample)
+        log_path = self.log_path
+        if log_path:
+            try:
+                with open(log_path, "a") as f:
+                    f.write(json.dumps(sample) + "\n")
+            except OSError:
+                pass  # the log is best-effort; the ring buffer still has the sample
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def summary(self) -> list:
+        """One row per stage: sample count and p50/p95/max/last in milliseconds."""
+        with self._lock:
+            stages = {name: [s["seconds"] for s in buf] for name, buf in self._stages.items()}
+        return [{
+            "Stage":    name,
+            "Samples":  len(secs),
+            "p50 (ms)": percentile(secs, 0.50) * 1000,
+            "p95 (ms)": percentile(secs, 0.95) * 1000,
+            "Max (ms)": max(secs) * 1000,
+            "Last (ms)": secs[-1] * 1000,
+        } for name, secs in stages.items()]
+
+    def to_jsonl(self) -> str:
+        """Every buffered sample as JSON lines, oldest first."""
+        with self._lock:
+            samples = [s for buf in self._stages.values() for s in buf]
+        return "".join(json.dumps(s) + "\n" for s in sorted(samples, key=lambda s: s["ts"]))
+
+    def clear(self):
+        with self._lock:
+            self._stages.clear()
+
+# ─────────────────────────────────────────────
+# SHARED TIMER
+# ─────────────────────────────────────────────
+TIMER = StageTimer()
+
+def stage(name: str):
+    """Time a `with` block into the process-wide timer."""
+    return TIMER.stage(name)
@@ -0,0 +1,158 @@
+import os
+import re
+import sys
+import html
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import data_store
+import engine
+
+# ─────────────────────────────────────────────
+# BATCH REPORTS
+#
+# Headless version of the dashboard: for every assignee and/or industry in the
+# Target sheet it writes the KPI cards, the comparison table and the churn
+# lists that the page shows with that filter applied. Groups are fanned out
+# over a process pool; each worker loads the model (from the Parquet cache)
+# and builds the filter index and churn frame once, then serves many groups.
+#
+#   python reports.py                              # every assignee + industry, CSV
+#   python reports.py --by assignee --format xlsx html --workers 8 --out nightly/
+#
+# Layout: <out>/<by>/<group>/{kpis,comparison,churn}.csv, <group>.xlsx and
+# <group>.html, plus <out>/<by>/summary.csv with one KPI row per group.
+# ─────────────────────────────────────────────
+DIMENSIONS = {"assignee": ("Assignee_", "Assignee"), "industry": ("industry_", "Industry")}
+FORMATS    = ("csv", "xlsx", "html")
+COMPARISON_LABELS = {"Corporates": "Corporate", "industry_": "Industry", "Assignee_": "Assignee"}
+
+_state = {}
+
+def _init_worker(path: str, version: str, month: str, years: tuple):
+    model  = data_store.load_model(path, version)
+    sheets = model.sheets
+    churn  = engine.build_churn_frame(sheets["Target"], sheets[years[0]], sheets[years[1]],
+                                      sheets[model.week_sheet], data_store.MONTH_COLS, model.week_cols, years)
+    _state.update(
+        sheets=sheets,
+        years=years,
+        index=engine.build_filter_index(sheets),
+        cube=engine.build_cube(sheets, data_store.MONTH_COLS, years),
+        month=month,
+        churn={**{f"{d}d": engine.churned_for_period(churn, d) for d in engine.CHURN_WINDOWS},
+               "global": engine.churned_global(churn)},
+    )
+
+def group_report(by: str, value: str) -> dict:
+    """{"kpis": {...}, "comparison": frame, "churn": frame} for one group."""
+    label      = DIMENSIONS[by][1]
+    prev, cur  = _state["years"]
+    selection  = {"corporate": engine.ALL, "industry": engine.ALL, "assignee": engine.ALL, by: value}
+    dash = engine.compute_dashboard(_state["sheets"], _state["index"], selection["corporate"],
+                                    selection["industry"], selection["assignee"],
+                                    _state["month"], data_store.MONTH_COLS, _state["cube"], _state["years"])
+    churn = pd.concat(
+        [frame.loc[frame[label] == value].assign(**{"Churn Period": period})
+         for period, frame in _state["churn"].items()],
+        ignore_index=True)
+    kpis = {
+        label:                 value,
+        "Total Target":        dash["total_target"],
+        f"Total {prev}":       dash["total_previous"],
+        f"Total {cur}":        dash["total_current"],
+        "Shortfall":           dash["shortfall"],
+        "Active Corporates":   dash["active_corps"],
+        "Growth vs Target %":  dash["growth_vs_target"],
+        f"Growth vs {prev} %": dash["growth_vs_previous"],
+        **{f"Churned {p}": int((churn["Churn Period"] == p).sum()) for p in _state["churn"]},
+    }
+    comparison = (dash["merged"]
+                  [["Corporates", "industry_", "Assignee_", "Target", prev, cur, f"% vs {prev}", "% vs Target"]]
+                  .rename(columns=COMPARISON_LABELS)
+                  .sort_values(cur, ascending=False, kind="stable"))
+    return {"kpis": kpis, "comparison": comparison, "churn": churn}
+
+def slug(value: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", str(value)).strip("_") or "blank"
+
+def _html_page(title: str, frames: dict) -> str:
+    parts = [f"<h1>{html.escape(title)}</h1>"]
+    for name, df in frames.items():
+        parts.append(f"<h2>{html.escape(name)}</h2>")
+        parts.append(df.to_html(index=False, float_format=lambda v: f"{v:,.1f}", border=0))
+    return ("<!doctype html><html><head><meta charset='utf-8'>"
+            f"<title>{html.escape(title)}</title>"
+            "<style>body{font-family:sans-serif}table{border-collapse:collapse}"
+            "td,th{padding:4px 8px;border-bottom:1px solid #ddd;text-align:right}</style>"
+            f"</head><body>{''.join(parts)}</body></html>")
+
+def write_group(by: str, value: str, out_dir: str, formats: tuple) -> dict:
+    """Build and write one group's report; returns its KPI row."""
+    report = group_report(by, value)
+    frames = {
+        "KPIs":       pd.DataFrame([report["kpis"]]),
+        "Comparison": report["comparison"],
+        "Churn":      report["churn"],
+    }
+    name   = slug(value)
+    folder = os.path.join(out_dir, by, name)
+    os.makedirs(folder, exist_ok=True)
+    if "csv" in formats:
+        for sheet, df in frames.items():
+            df.to_csv(os.path.join(folder, f"{sheet.lower()}.csv"), index=False)
+    if "xlsx" in formats:
+        with pd.ExcelWriter(os.path.join(folder, f"{name}.xlsx")) as writer:
+            for sheet, df in frames.items():
+                df.to_excel(writer, sheet_name=sheet, index=False)
+    if "html" in formats:
+        with open(os.path.join(folder, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(_html_page(f"{DIMENSIONS[by][1]}: {value}", frames))
+    return report["kpis"]
+
+def group_values(path: str, version: str, by: str) -> list:
+    target = data_store.load_model(path, version).sheets["Target"]
+    return sorted(target[DIMENSIONS[by][0]].dropna().unique())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write per-assignee / per-industry dashboard reports.")
+    parser.add_argument("--data", default=data_store.DATA_FILE, help="workbook (default: data.xlsx)")
+    parser.add_argument("--by", nargs="+", choices=list(DIMENSIONS), default=list(DIMENSIONS))
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=["csv"], dest="formats")
+    parser.add_argument("--month", default=engine.ALL, help="restrict to one month of the current year (e.g. Mar)")
+    parser.add_argument("--compare-year", help="comparison year sheet (default: the year before the latest)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default=os.path.join("reports", datetime.now().strftime("%Y-%m-%d")))
+    args = parser.parse_args(argv)
+    if args.month != engine.ALL and args.month not in data_store.MONTH_COLS:
+        parser.error(f"--month must be one of {', '.join(data_store.MONTH_COLS)}")
+
+    version = data_store.data_version(args.data)
+    model   = data_store.load_model(args.data, version)   # parse once; workers read the Parquet cache
+    years   = model.year_pair
+    if args.compare_year:
+        if args.compare_year not in model.years[:-1]:
+            parser.error(f"--compare-year must be one of {', '.join(model.years[:-1])}")
+        years = (args.compare_year, model.years[-1])
+    jobs = [(by, value) for by in args.by for value in group_values(args.data, version, by)]
+    print(f"{len(jobs)} reports → {args.out}", file=sys.stderr)
+
+    summaries = {by: [] for by in args.by}
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args.data, version, args.month, years)) as pool:
+        futures = [(by, pool.submit(write_group, by, value, args.out, tuple(args.formats)))
+                   for by, value in jobs]
+        for by, future in futures:
+            summaries[by].append(future.result())
+
+    for by, rows in summaries.items():
+        os.makedirs(os.path.join(args.out, by), exist_ok=True)
+        pd.DataFrame(rows).to_csv(os.path.join(args.out, by, "summary.csv"), index=False)
+    print(f"Wrote {len(jobs)} reports for data version {version[:12]}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,380 @@
+import os
+import sys
+import sqlite3
+import argparse
+import pathlib
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import data_store
+import engine
+
+# ─────────────────────────────────────────────
+# SQL BACKEND
+#
+# Optional storage backend (DATA_BACKEND = "sqlite" in secrets). Each data
+# version is also written to an embedded SQLite file next to its Parquet
+# cache: one table per sheet in the workbook layout (row position, the
+# non-value columns, one REAL column per month/week), indexed on Corporates,
+# industry_ and Assignee_, plus the Target sheet's corporate → industry and
+# assignee memberships. The sidebar filters become WHERE predicates on those
+# indexes, and the row sums, the comparison join, KPI totals, the monthly
+# series, the assignee/industry group-bys and the churn lists are computed by
+# the database, which returns only their result rows. The one sheet whose
+# filtered rows are listed (the week sheet, for the weekly table and charts)
+# is fetched on its own, in the model's dtypes; an unfiltered view uses the
+# model's shared frames. The model itself stays loaded — the other sections
+# and the database build read it — so the backend moves the filter and
+# aggregate work into SQLite rather than shrinking the process.
+#
+# Results follow the pandas path (engine.py) row for row: the same filter
+# semantics (Target is master for industry/assignee; rows without a key
+# never match), months added left to right as DataFrame.sum(axis=1) does,
+# keys in the same order, duplicate keys crossed as in an outer merge.
+# Whole-number totals are identical; totals of fractional values (targets)
+# can differ in the last bit or two, since SQLite adds rows in order where
+# numpy sums pairwise and pandas' group-bys compensate — the same tolerance
+# as the summary cube. The queries need SQLite 3.32 or later (IIF), so they
+# run on the 3.34 of the Debian bullseye devcontainer.
+#
+#   python sql_store.py --verify        # compare every filter value against pandas
+# ─────────────────────────────────────────────
+DB_FILE = "data.sqlite3"
+MEMBERS = "_members"
+NO_KEY  = "X''"   # joins rows without a key: equal only to itself, sorts after every text key
+KEY_COL = engine.KEY_COL
+ALL     = engine.ALL
+
+def _q(name) -> str:
+    """`name` as a quoted SQL identifier."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _row_sum(cols: list, table: str = "") -> str:
+    """SQL adding `cols` left to right, the order DataFrame.sum(axis=1) adds them in."""
+    prefix = f"{table}." if table else ""
+    return " + ".join(prefix + _q(c) for c in cols) if cols else "0.0"
+
+def _read(sql: str, db: sqlite3.Connection, params=None, **kwargs) -> pd.DataFrame:
+    """pd.read_sql_query(), with NULLs in all-NULL text columns as NaN like the sheets hold them."""
+    df = pd.read_sql_query(sql, db, params=params, **kwargs)
+    for c in df.columns[df.dtypes == object]:
+        df[c] = df[c].where(df[c].notna(), np.nan)
+    return df
+
+def database_path(version: str) -> str:
+    return os.path.join(data_store.cache_dir(version), DB_FILE)
+
+def _create_sheet(db: sqlite3.Connection, name: str, df: pd.DataFrame):
+    df    = data_store.plain_frame(df)
+    value = set(data_store.value_cols(df))
+    cols  = ", ".join(f"{_q(c)} REAL" if c in value else _q(c) for c in df.columns)
+    db.execute(f"CREATE TABLE {_q(name)} (pos INTEGER PRIMARY KEY, {cols})")
+    marks = ", ".join(["?"] * (len(df.columns) + 1))
+    db.executemany(f"INSERT INTO {_q(name)} VALUES ({marks})",
+                   zip(range(len(df)), *(df[c].tolist() for c in df.columns)))
+    for dim in engine.FILTER_DIMS:
+        if dim in df.columns:
+            db.execute(f"CREATE INDEX {_q(f'{name}.{dim}')} ON {_q(name)} ({_q(dim)})")
+
+def _create_members(db: sqlite3.Connection, target_df: pd.DataFrame):
+    db.execute(f"CREATE TABLE {MEMBERS} (dim TEXT, value, corp)")
+    for dim in engine.FILTER_DIMS[1:]:
+        pairs = data_store.plain_frame(target_df[[KEY_COL, dim]]).dropna().drop_duplicates()
+        db.executemany(f"INSERT INTO {MEMBERS} VALUES (?, ?, ?)",
+                       ((dim, value, corp) for corp, value in zip(pairs[KEY_COL].tolist(), pairs[dim].tolist())))
+    db.execute(f"CREATE INDEX {_q(MEMBERS + '.dim')} ON {MEMBERS} (dim, value, corp)")
+
+def build_database(model: data_store.DataModel, path: str):
+    """Write `model` to a new database file at `path` (atomically replaced)."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"   # sessions may build the same version at once
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    try:
+        with db:
+            for name, df in model.sheets.items():
+                _create_sheet(db, name, df)
+            _create_members(db, model.sheets[data_store.TARGET_SHEET])
+    finally:
+        db.close()
+    os.replace(tmp, path)
+
+def open_store(model: data_store.DataModel) -> "SqlStore":
+    """The SqlStore for `model`'s version, writing its database file on first use."""
+    path = database_path(model.version)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        build_database(model, path)
+    return SqlStore(path)
+
+class SqlStore:
+    """Queries against one data version's database file, which never changes once written."""
+    def __init__(self, path: str):
+        self.path    = path
+        self.columns = {}   # {sheet: columns after pos}, in workbook order
+        self.values  = {}   # {sheet: month/week columns}
+        with self._db() as db:
+            tables = db.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name != ? "
+                                "ORDER BY rowid", (MEMBERS,)).fetchall()
+            for (name,) in tables:
+                info = db.execute(f"PRAGMA table_info({_q(name)})").fetchall()[1:]
+                self.columns[name] = [row[1] for row in info]
+                self.values[name]  = [row[1] for row in info if row[2] == "REAL"]
+
+    @contextmanager
+    def _db(self):
+        # One short-lived read-only connection per call; temp tables die with it.
+        db = sqlite3.connect(pathlib.Path(self.path).absolute().as_uri() + "?mode=ro", uri=True)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _present(self, sheet: str, cols: list) -> list:
+        return [c for c in cols if c in self.columns[sheet]]
+
+    # ── FILTERS ──
+    def _where(self, corporate: str, industry: str, assignee: str) -> tuple:
+        """(WHERE clause, named params) for the rows matching the filter selections."""
+        key     = _q(KEY_COL)
+        clauses = []
+        params  = {"corporate": corporate, "industry": industry, "assignee": assignee}
+        if corporate != ALL:
+            clauses.append(f"{key} = :corporate")
+        for dim, param in (("industry_", "industry"), ("Assignee_", "assignee")):
+            if params[param] != ALL:
+                clauses.append(f"{key} IN (SELECT corp FROM {MEMBERS} "
+                               f"WHERE dim = '{dim}' AND value = :{param})")
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _frame(self, db: sqlite3.Connection, sheet: str, where: str, params: dict) -> pd.DataFrame:
+        df = _read(f"SELECT * FROM {_q(sheet)}{where} ORDER BY pos", db, params,
+                   index_col="pos", dtype={c: "float64" for c in self.values[sheet]})
+        df.index.name = None
+        return df
+
+    def apply_filters(self, corporate: str = ALL, industry: str = ALL, assignee: str = ALL,
+                      sheets: dict = None) -> dict:
+        """engine.apply_filters(): the matching rows of every sheet, indexed by row position.
+
+        With `sheets` ({name: model frame}) only those are fetched, cast to
+        their frames' dtypes (the model's categories and float32 columns).
+        """
+        where, params = self._where(corporate, industry, assignee)
+        with self._db() as db:
+            if sheets is None:
+                return {name: self._frame(db, name, where, params) for name in self.columns}
+            return {name: self._frame(db, name, where, params).astype(df.dtypes.to_dict())
+                    for name, df in sheets.items()}
+
+    # ── DASHBOARD ──
+    def _totals(self, sheet: str, alias: str, months: list, where: str) -> str:
+        cols = self._present(sheet, months)
+        return (f"{alias} AS (SELECT pos, IFNULL({_q(KEY_COL)}, {NO_KEY}) AS k, {_row_sum(cols)} AS v "
+                f"FROM {_q(sheet)}{where})")
+
+    def _first_row(self, sheet: str, alias: str) -> str:
+        """LEFT JOIN of each key's first row in `sheet` (drop_duplicates(keep="first"))."""
+        return (f"LEFT JOIN {_q(sheet)} {alias} ON {alias}.pos = "
+                f"(SELECT MIN(pos) FROM {_q(sheet)} WHERE {_q(KEY_COL)} = keys.k)")
+
+    def _merged(self, db: sqlite3.Connection, years: tuple, months: list, where: str,
+                params: dict) -> pd.DataFrame:
+        """engine.build_merged(), kept as temp.merged for the group-bys."""
+        prev, cur = years
+        db.execute("DROP TABLE IF EXISTS temp.merged")
+        # Missing keys match each other and sort last, and the key comes out
+        # as 0 — what the outer merge followed by fillna(0) gives.
+        db.execute(f"""CREATE TEMP TABLE merged AS WITH
+            {self._totals(cur, "cur", months, where)},
+            {self._totals(prev, "prev", months, where)},
+            {self._totals("Target", "tgt", months, where)},
+            keys AS (SELECT k FROM cur UNION SELECT k FROM prev UNION SELECT k FROM tgt)
+            SELECT IIF(keys.k = {NO_KEY}, 0, keys.k)                AS {_q(KEY_COL)},
+                   COALESCE(cur.v, 0.0)                              AS {_q(cur)},
+                   COALESCE(prev.v, 0.0)                             AS {_q(prev)},
+                   COALESCE(tgt.v, 0.0)                              AS "Target",
+                   COALESCE(meta.industry_, meta_prev.industry_, '—') AS industry_,
+                   COALESCE(meta.Assignee_, meta_prev.Assignee_, '—') AS Assignee_
+            FROM keys
+            LEFT JOIN cur  ON cur.k  = keys.k
+            LEFT JOIN prev ON prev.k = keys.k
+            LEFT JOIN tgt  ON tgt.k  = keys.k
+            {self._first_row("Target", "meta")}
+            {self._first_row(prev, "meta_prev")}
+            ORDER BY keys.k, cur.pos, prev.pos, tgt.pos""", params)
+        merged = _read("SELECT * FROM temp.merged ORDER BY rowid", db,
+                       dtype={cur: "float64", prev: "float64", "Target": "float64"})
+        return engine.add_growth(merged, years)
+
+    def _group_sums(self, db: sqlite3.Connection, dim: str, label: str, cols: dict) -> pd.DataFrame:
+        sums = ", ".join(f"TOTAL({_q(c)}) AS {_q(name)}" for c, name in cols.items())
+        return _read(f"SELECT {dim} AS {_q(label)}, {sums} FROM temp.merged "
+                     f"GROUP BY {dim} ORDER BY {dim}", db,
+                     dtype={name: "float64" for name in cols.values()})
+
+    def _summary(self, db: sqlite3.Connection, years: tuple, months: list, where: str,
+                 params: dict) -> dict:
+        """engine.summarize_frames() for the rows `where` selects and temp.merged."""
+        prev, cur = years
+        monthly, totals = {"Month": months}, {}
+        for label in ("Target", prev, cur):
+            present = self._present(label, months)
+            sums    = [f"TOTAL({_q(m)})" for m in present] + [f"TOTAL({_row_sum(present)})"]
+            row     = db.execute(f"SELECT {', '.join(sums)} FROM {_q(label)}{where}", params).fetchone()
+            by_month = dict(zip(present, row))
+            monthly[label] = [by_month.get(m, 0.0) for m in months]
+            totals[label]  = row[-1]
+        active = db.execute(f"SELECT COUNT(DISTINCT {_q(KEY_COL)}) FROM {_q(cur)}{where}", params).fetchone()[0]
+
+        agg_asn = (self._group_sums(db, "Assignee_", "Assignee", {cur: cur})
+                   .sort_values(cur, ascending=False))
+        agg_ind = (self._group_sums(db, "industry_", "Industry", {cur: cur})
+                   .sort_values(cur, ascending=True))
+        attain  = self._group_sums(db, "Assignee_", "Assignee", {"Target": "Target", cur: f"Revenue {cur}"})
+        attain["Attainment %"] = engine.pct_of(attain[f"Revenue {cur}"], attain["Target"])
+        return {
+            "total_current":  totals[cur],
+            "total_previous": totals[prev],
+            "total_target":   totals["Target"],
+            "active_corps":   active,
+            "monthly":      pd.DataFrame(monthly, columns=["Month", "Target", prev, cur]).astype(
+                                {"Target": "float64", prev: "float64", cur: "float64"}),
+            "agg_asn":      agg_asn,
+            "agg_ind":      agg_ind,
+            "attain":       attain,
+        }
+
+    def compute_dashboard(self, corporate: str = ALL, industry: str = ALL, assignee: str = ALL,
+                          month: str = ALL, month_cols: list = data_store.MONTH_COLS,
+                          years: tuple = None, filtered: dict = None) -> dict:
+        """engine.compute_dashboard() answered by the database.
+
+        `filtered` becomes the result's "filtered" as given — the row frames
+        the caller lists, if any; None fetches every sheet, as engine does.
+        """
+        prev, cur = years = tuple(years or engine.latest_years(self.columns))
+        available = self._present(cur, month_cols)
+        months    = available if month == ALL else [month]
+        where, params = self._where(corporate, industry, assignee)
+        with self._db() as db:
+            if filtered is None:
+                filtered = {name: self._frame(db, name, where, params) for name in self.columns}
+            merged   = self._merged(db, years, months, where, params)
+            summary  = self._summary(db, years, months, where, params)
+        return engine.dashboard_state(years, filtered, months, merged, summary)
+
+    # ── CHURN ──
+    def build_churn_frame(self, month_cols: list, week_sheet: str, week_cols: list, years: tuple,
+                          windows: tuple = engine.CHURN_WINDOWS) -> pd.DataFrame:
+        """engine.build_churn_frame() answered by the database."""
+        prev, cur = years
+        key = _q(KEY_COL)
+
+        def first_rows(sheet):
+            return (f"SELECT * FROM {_q(sheet)} WHERE pos IN "
+                    f"(SELECT MIN(pos) FROM {_q(sheet)} WHERE {key} IS NOT NULL GROUP BY {key})")
+
+        with self._db() as db:
+            has_weeks = week_sheet in self.columns and db.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {_q(week_sheet)})").fetchone()[0]
+            inactive = f"b.{key} NOT IN (SELECT {key} FROM {_q(cur)} WHERE {key} IS NOT NULL)"
+            flags    = {"Inactive": inactive}
+            for days in windows:
+                existing = self._present(week_sheet, engine.churn_weeks(days, week_cols)) if has_weeks else []
+                flags[f"Churned {days}d"] = (
+                    f"({inactive} OR b.{key} IN (SELECT {key} FROM {_q(week_sheet)} "
+                    f"WHERE {_row_sum(existing)} = 0))" if existing else inactive)
+            meta = {dim: f"b.{dim}" if dim in self.columns[prev] else "'—'"
+                    for dim in ("industry_", "Assignee_")}
+            out = _read(f"""
+                SELECT b.{key}                                             AS "Corporate",
+                       {meta["industry_"]}                                 AS "Industry",
+                       {meta["Assignee_"]}                                 AS "Assignee",
+                       {_row_sum(self._present(prev, month_cols), "b")}    AS {_q(f"{prev} Total")},
+                       COALESCE(t.v, 0.0)                                  AS "Target",
+                       {", ".join(f"{sql} AS {_q(flag)}" for flag, sql in flags.items())}
+                FROM ({first_rows(prev)}) b
+                LEFT JOIN (SELECT {key} AS k, {_row_sum(self._present("Target", month_cols))} AS v
+                           FROM ({first_rows("Target")})) t ON t.k = b.{key}
+                WHERE {" OR ".join(f"({sql})" for sql in flags.values())}
+                ORDER BY b.pos""", db, dtype={f"{prev} Total": "float64", "Target": "float64"})
+        return out.astype({flag: bool for flag in flags})
+
+# ─────────────────────────────────────────────
+# PARITY CHECK
+#
+# Runs every Industry and Assignee filter value, the first Corporates and
+# each month through both backends and reports any difference. Row sets,
+# keys, order and labels must be identical; sums may differ only by
+# floating-point rounding (see SQL BACKEND above).
+# ─────────────────────────────────────────────
+RTOL = 1e-12
+
+def _same(a, b) -> bool:
+    if isinstance(a, pd.DataFrame):
+        try:
+            pd.testing.assert_frame_equal(data_store.plain_frame(a), data_store.plain_frame(b),
+                                          check_dtype=False,
+                                          check_index_type=False, check_exact=False, rtol=RTOL)
+        except AssertionError:
+            return False
+        return True
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, float):
+        return abs(a - b) <= RTOL * max(abs(a), abs(b))
+    return a == b
+
+def verify(model: data_store.DataModel, store: SqlStore, corporates: int = 20) -> list:
+    """Names of the checks where the SQL backend differs from the pandas path."""
+    sheets = model.sheets
+    target = sheets[data_store.TARGET_SHEET]
+    index  = engine.build_filter_index(sheets)
+    years  = model.year_pair
+    cases  = [(ALL, ALL, ALL)]
+    cases += [(ALL, v, ALL) for v in sorted(target["industry_"].dropna().unique())]
+    cases += [(ALL, ALL, v) for v in sorted(target["Assignee_"].dropna().unique())]
+    cases += [(v, ALL, ALL) for v in sorted(target[KEY_COL].dropna().unique())[:corporates]]
+    months = [ALL] + [m for m in data_store.MONTH_COLS if m in sheets[years[1]].columns]
+
+    failed = []
+    for corporate, industry, assignee in cases:
+        for month in months if (corporate, industry, assignee) == (ALL, ALL, ALL) else [ALL]:
+            expected = engine.compute_dashboard(sheets, index, corporate, industry, assignee, month,
+                                                data_store.MONTH_COLS, years=years)
+            actual   = store.compute_dashboard(corporate, industry, assignee, month,
+                                               data_store.MONTH_COLS, years)
+            failed += [f"{name} ({corporate} / {industry} / {assignee} / {month})"
+                       for name in expected if not _same(expected[name], actual[name])]
+    churn_args = (data_store.MONTH_COLS, model.week_cols, years)
+    expected   = engine.build_churn_frame(target, sheets[years[0]], sheets[years[1]],
+                                          sheets[model.week_sheet], *churn_args)
+    if not _same(expected, store.build_churn_frame(data_store.MONTH_COLS, model.week_sheet,
+                                                   model.week_cols, years)):
+        failed.append("churn")
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the SQL backend's database for the workbook.")
+    parser.add_argument("--data", default=data_store.DATA_FILE, help="workbook (default: data.xlsx)")
+    parser.add_argument("--verify", action="store_true", help="compare every filter value against pandas")
+    parser.add_argument("--corporates", type=int, default=20, help="corporates to verify (default: 20)")
+    args = parser.parse_args(argv)
+
+    model = data_store.load_model(args.data)
+    store = open_store(model)
+    print(f"{store.path}: {len(store.columns)} sheets", file=sys.stderr)
+    if not args.verify:
+        return 0
+    failed = verify(model, store, args.corporates)
+    for name in failed:
+        print(f"  differs: {name}", file=sys.stderr)
+    print("SQL backend matches pandas" if not failed else f"{len(failed)} differences", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
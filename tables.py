@@ -0,0 +1,156 @@
+import os
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+# ─────────────────────────────────────────────
+# PAGED TABLES
+#
+# Large tables are searched, sorted and sliced on the server so only the
+# visible page — and only the chosen columns — is serialized to the browser.
+# The source frames come from the shared caches and are never mutated: a
+# search/sort result is an array of row positions, and a page is one take()
+# of it with display formatting applied to those rows alone.
+# ─────────────────────────────────────────────
+PAGE_SIZES = (25, 50, 100, 250)
+
+def search_columns(df: pd.DataFrame) -> list:
+    """Text columns a search term is matched against."""
+    return [c for c in df.columns
+            if not pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+
+def row_order(df: pd.DataFrame, search: str = "", sort_col: str = None,
+              ascending: bool = True) -> np.ndarray:
+    """Positions of the rows matching `search`, ordered by `sort_col` (stable, blanks last)."""
+    pos  = np.arange(len(df))
+    term = search.strip()
+    if term:
+        mask = np.zeros(len(df), dtype=bool)
+        for col in search_columns(df):
+            mask |= df[col].astype(str).str.contains(term, case=False, regex=False, na=False).to_numpy()
+        pos = pos[mask]
+    if sort_col is not None and len(pos):
+        keys = df[sort_col].take(pos).reset_index(drop=True)
+        pos  = pos[keys.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()]
+    return pos
+
+def page_count(n_rows: int, page_size: int) -> int:
+    return max(1, -(-n_rows // page_size))
+
+def page_frame(df: pd.DataFrame, order: np.ndarray, page: int, page_size: int,
+               columns: list = None, labels: dict = None, formats: dict = None) -> pd.DataFrame:
+    """Rows of 1-based `page` in `order`, projected to `columns`, formatted and relabelled."""
+    start = (page - 1) * page_size
+    view  = df.take(order[start:start + page_size])
+    if columns is not None:
+        view = view[columns]
+    for col, fmt in (formats or {}).items():
+        if col in view.columns:
+            view = view.assign(**{col: fmt(view[col])})
+    return view.rename(columns=labels or {}).reset_index(drop=True)
+
+def export_frame(df: pd.DataFrame, order: np.ndarray, labels: dict = None) -> pd.DataFrame:
+    """Every row in `order` with all columns and raw values, for download."""
+    return df.take(order).rename(columns=labels or {}).reset_index(drop=True)
+
+# ─────────────────────────────────────────────
+# EXPORT
+#
+# Downloads hold every row of a table in its current search/sort order, with
+# raw values. They are written straight to a file CHUNK_ROWS rows at a time
+# (one take() of the shared frame per chunk, written and dropped), so no
+# formatted or full-size copy of the table is built: CSV is appended chunk
+# by chunk, Parquet gets one row group per chunk and XLSX goes through
+# openpyxl's write-only mode. Files are kept per table identity (data version
+# plus filter state) and row order, so downloading the same view again — in
+# any session — only reads the file. A folder keeps the EXPORT_KEEP most
+# recently served files; older ones are deleted when a new one is written.
+# ─────────────────────────────────────────────
+CHUNK_ROWS     = 10_000
+EXPORT_KEEP    = 32
+EXPORT_FORMATS = {   # format: (extension, MIME type)
+    "CSV":     (".csv", "text/csv"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "XLSX":    (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+def iter_chunks(df: pd.DataFrame, order: np.ndarray, labels: dict = None, chunk_rows: int = CHUNK_ROWS):
+    """export_frame() in slices of at most `chunk_rows` rows (one empty slice for no rows)."""
+    for start in range(0, max(len(order), 1), chunk_rows):
+        yield export_frame(df, order[start:start + chunk_rows], labels)
+
+def _write_csv(chunks, f):
+    for i, chunk in enumerate(chunks):
+        f.write(chunk.to_csv(index=False, header=i == 0).encode("utf-8"))
+
+def _write_parquet(chunks, f):
+    writer = None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(chunk, preserve_index=False, schema=None if writer is None else writer.schema)
+        if writer is None:
+            writer = pq.ParquetWriter(f, table.schema)
+        writer.write_table(table)
+    writer.close()
+
+def _write_xlsx(chunks, f):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Export")
+    for i, chunk in enumerate(chunks):
+        if i == 0:
+            ws.append([str(c) for c in chunk.columns])
+        rows = chunk.astype(object).where(chunk.notna(), None)   # blanks for NaN, like to_excel()
+        for row in rows.itertuples(index=False, name=None):
+            ws.append(row)
+    wb.save(f)
+
+_WRITERS = {"CSV": _write_csv, "Parquet": _write_parquet, "XLSX": _write_xlsx}
+
+def export_path(folder: str, key: tuple, fmt: str) -> str:
+    """Where the export identified by `key` (table identity + row order) is kept."""
+    digest = hashlib.sha256(repr(key).encode()).hexdigest()[:24]
+    return os.path.join(folder, digest + EXPORT_FORMATS[fmt][0])
+
+def export_file(folder: str, key: tuple, df: pd.DataFrame, order: np.ndarray, fmt: str,
+                labels: dict = None) -> str:
+    """Path of the `fmt` export of `df` in `order`, written in chunks on first use."""
+    path = export_path(folder, key, fmt)
+    if os.path.exists(path):
+        os.utime(path)   # served again: newest for prune_exports()
+        return path
+    os.makedirs(folder, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            _WRITERS[fmt](iter_chunks(df, order, labels), f)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    prune_exports(folder, keep={path})
+    return path
+
+def prune_exports(folder: str, limit: int = EXPORT_KEEP, keep: set = frozenset()):
+    """Delete all but the `limit` most recently served export files in `folder`."""
+    exts  = tuple(ext for ext, _ in EXPORT_FORMATS.values())
+    files = []
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.endswith(exts):
+            try:
+                files.append((entry.stat().st_mtime_ns, entry.path))
+            except FileNotFoundError:   # pruned by another session meanwhile
+                pass
+    for _, path in sorted(files, reverse=True)[limit:]:
+        if path not in keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,29 @@
+import pytest
+
+import bot_client
+from mock_messages_api import start_mock_server
+
+@pytest.fixture(scope="module")
+def base_url():
+    server, url = start_mock_server()
+    yield url
+    server.shutdown()
+
+def ask(base_url: str, question: str) -> list:
+    client = bot_client.BotClient(base_url)
+    return list(client.stream("sk-test", "system", [{"role": "user", "content": question}]))
+
+def test_stream_returns_the_whole_answer(base_url):
+    assert "".join(ask(base_url, "how are sales")) == "Mock answer to: how are sales"
+
+def test_stream_cut_off_before_message_stop_raises(base_url):
+    parts = []
+    with pytest.raises(bot_client.BotError, match="message_stop"):
+        for part in bot_client.BotClient(base_url).stream(
+                "sk-test", "system", [{"role": "user", "content": "a long enough question [[truncate]]"}]):
+            parts.append(part)
+    assert parts   # some text arrived before the cut, and was not treated as an answer
+
+def test_stream_error_event_raises(base_url):
+    with pytest.raises(bot_client.BotError, match="overloaded_error"):
+        ask(base_url, "a long enough question [[stream-error]]")
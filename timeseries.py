@@ -0,0 +1,168 @@
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# ─────────────────────────────────────────────
+# TIME SERIES STORE
+#
+# Every month and week value in the workbook lives in one long table instead
+# of wide per-sheet columns — one row per non-zero (sheet row, period) cell:
+#
+#   sheet          category   source sheet ("Target", "2025", "2026_week_data", …)
+#   row            int32      row position in that sheet (its metadata frame)
+#   corp           category   Corporates key of that row
+#   period_type    category   "month" | "week"
+#   period_start   datetime   first day of the month / week
+#   metric         category   "target" (Target sheet) | "revenue"
+#   value          float32 where every value of the sheet fits exactly, else float64
+#
+# Each sheet keeps a sorted period index (every period column it had, zero
+# or not) and its cells sorted by (period, row), so the cells of any period
+# range are one contiguous slice found by searchsorted. A pivot scatters that
+# slice into a dense rows × periods matrix — the wide frames the engine works
+# on are produced this way, for whichever years and week/month range are
+# asked for, without code knowing how many weeks or years the workbook has.
+#
+# Week N of a year starts on day 7·(N-1)+1 (weeks are numbered from 1 Jan,
+# not ISO weeks). The Target sheet has no year in its name; its months are
+# dated in the latest year sheet's year.
+# ─────────────────────────────────────────────
+MONTH_COLS   = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
+WEEK_COL_RE  = re.compile(r"^week (\d+)$")
+PERIOD_TYPES = ["month", "week"]
+METRICS      = ["target", "revenue"]
+PERIOD_COLS  = ["label", "period_type", "period_start", "metric"]
+
+def fits_float32(values) -> bool:
+    """True when every value survives a round trip through float32 exactly."""
+    values = np.asarray(values)
+    return bool(np.array_equal(values.astype("float32"), values))
+
+def _narrow(values: np.ndarray) -> np.ndarray:
+    return values.astype("float32") if fits_float32(values) else values
+
+def period_start(label: str, year: int) -> pd.Timestamp:
+    """First day of the month or week a value column label stands for."""
+    if label in MONTH_COLS:
+        return pd.Timestamp(year, MONTH_COLS.index(label) + 1, 1)
+    week = int(WEEK_COL_RE.match(label).group(1))
+    return pd.Timestamp(year, 1, 1) + pd.Timedelta(days=7 * (week - 1))
+
+@dataclass
+class SheetSeries:
+    """Long-format values of one sheet. Read-only once built."""
+    periods: pd.DataFrame   # PERIOD_COLS, sorted by period_start
+    cells:   pd.DataFrame   # row, corp, period (position in periods), value; sorted by (period, row)
+    offsets: np.ndarray     # cells of period i are cells[offsets[i]:offsets[i + 1]]
+    n_rows:  int
+
+    def span(self, start=None, end=None) -> tuple:
+        """(first, last + 1) period positions with start <= period_start <= end."""
+        starts = self.periods["period_start"].to_numpy()
+        lo = 0 if start is None else int(np.searchsorted(starts, np.datetime64(pd.Timestamp(start)), "left"))
+        hi = len(starts) if end is None else int(np.searchsorted(starts, np.datetime64(pd.Timestamp(end)), "right"))
+        return lo, max(lo, hi)
+
+    def pivot(self, start=None, end=None) -> tuple:
+        """(rows × periods float64 matrix, period labels) for the periods in [start, end]."""
+        lo, hi = self.span(start, end)
+        out    = np.zeros((self.n_rows, hi - lo))
+        block  = slice(self.offsets[lo], self.offsets[hi])
+        out[self.cells["row"].to_numpy()[block], self.cells["period"].to_numpy()[block] - lo] = \
+            self.cells["value"].to_numpy()[block]
+        return out, self.periods["label"].iloc[lo:hi].tolist()
+
+def sheet_series(df: pd.DataFrame, value_cols: list, period_type_of, metric: str,
+                 year: int, key_col: str = "Corporates") -> SheetSeries:
+    """Melt the (numeric, normalized) value columns of one sheet into a SheetSeries."""
+    periods = pd.DataFrame({
+        "label":        value_cols,
+        "period_type":  [period_type_of(c) for c in value_cols],
+        "period_start": [period_start(c, year) for c in value_cols],
+        "metric":       metric,
+    }).sort_values("period_start", kind="stable", ignore_index=True)
+    periods["period_start"] = periods["period_start"].astype("datetime64[ns]")
+    values = df[periods["label"].tolist()].to_numpy(dtype="float64")
+    period, row = np.nonzero(values.T != 0)     # transposed → sorted by (period, row)
+    corp = pd.Categorical(df[key_col].to_numpy(dtype=object)[row])
+    cells = pd.DataFrame({
+        "row":    row.astype("int32"),
+        "corp":   corp,
+        "period": period.astype("int32"),
+        "value":  _narrow(values[row, period]),
+    })
+    offsets = np.searchsorted(period, np.arange(len(periods) + 1))
+    return SheetSeries(periods, cells, offsets, len(df))
+
+class SeriesStore:
+    """{sheet: SheetSeries} with pivots back to wide frames and a combined long view."""
+
+    def __init__(self, sheets: dict):
+        self.sheets = dict(sheets)
+
+    def pivot(self, sheet: str, start=None, end=None) -> tuple:
+        return self.sheets[sheet].pivot(start, end)
+
+    def labels(self, sheet: str, period_type: str = None) -> list:
+        """Period labels of `sheet` in time order, optionally only one period type."""
+        periods = self.sheets[sheet].periods
+        if period_type is not None:
+            periods = periods[periods["period_type"] == period_type]
+        return periods["label"].tolist()
+
+    def wide(self, sheet: str, meta: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+        """`meta` (the sheet's non-value columns) with one float64 column per period in range."""
+        values, labels = self.pivot(sheet, start, end)
+        return pd.concat([meta.reset_index(drop=True),
+                          pd.DataFrame(values, columns=labels)], axis=1)
+
+    def frame(self) -> pd.DataFrame:
+        """Every cell of every sheet as one long frame with categorical keys."""
+        parts = []
+        for name, s in self.sheets.items():
+            per = s.periods.iloc[s.cells["period"].to_numpy()]
+            parts.append(pd.DataFrame({
+                "sheet":        name,
+                "row":          s.cells["row"].to_numpy(),
+                "corp":         s.cells["corp"].astype(object).to_numpy(),
+                "period_type":  per["period_type"].to_numpy(),
+                "period_start": per["period_start"].to_numpy(),
+                "metric":       per["metric"].to_numpy(),
+                "value":        s.cells["value"].to_numpy(),
+            }))
+        long = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(
+            columns=["sheet", "row", "corp", "period_type", "period_start", "metric", "value"])
+        return long.astype({
+            "sheet":       pd.CategoricalDtype(list(self.sheets)),
+            "row":         "int32",
+            "corp":        "category",
+            "period_type": pd.CategoricalDtype(PERIOD_TYPES),
+            "metric":      pd.CategoricalDtype(METRICS),
+            "value":       "float64",
+        })
+
+    def period_index(self) -> pd.DataFrame:
+        """PERIOD_COLS for every sheet, with a leading sheet column."""
+        return pd.concat([s.periods.assign(sheet=name)[["sheet"] + PERIOD_COLS]
+                          for name, s in self.sheets.items()], ignore_index=True)
+
+def from_frames(long: pd.DataFrame, periods: pd.DataFrame, n_rows: dict) -> SeriesStore:
+    """Rebuild a store from frame() / period_index() output (e.g. read back from Parquet)."""
+    sheets = {}
+    for name, rows in n_rows.items():
+        per   = periods.loc[periods["sheet"] == name, PERIOD_COLS].reset_index(drop=True)
+        per["period_start"] = per["period_start"].astype("datetime64[ns]")
+        part  = long.loc[long["sheet"] == name]
+        pos   = np.searchsorted(per["period_start"].to_numpy(), part["period_start"].to_numpy())
+        order = np.lexsort((part["row"].to_numpy(), pos))
+        cells = pd.DataFrame({
+            "row":    part["row"].to_numpy()[order].astype("int32"),
+            "corp":   pd.Categorical(part["corp"].array[order]).remove_unused_categories(),
+            "period": pos[order].astype("int32"),
+            "value":  _narrow(part["value"].to_numpy()[order]),
+        })
+        sheets[name] = SheetSeries(per, cells, np.searchsorted(cells["period"].to_numpy(),
+                                                               np.arange(len(per) + 1)), rows)
+    return SeriesStore(sheets)
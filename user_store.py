@@ -0,0 +1,93 @@
+import os
+import copy
+import json
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: fall back to the in-process lock only
+    fcntl = None
+
+# ─────────────────────────────────────────────
+# USER STORE
+#
+# Process-wide view of retention_users.json layered over the built-in
+# accounts. The parsed file is kept in memory and re-read only when its
+# (mtime, size) changes, so sign-ins don't touch the disk. Every write is a
+# read-modify-write under an exclusive lock on a sidecar .lock file —
+# re-reading the latest file first, so concurrent admin edits from other
+# sessions or replicas are not lost — and lands via temp file + rename.
+# ─────────────────────────────────────────────
+class UserStore:
+    def __init__(self, path: str, builtin: dict):
+        self.path      = path
+        self.lock_path = path + ".lock"
+        self.builtin   = builtin
+        self._lock     = threading.Lock()
+        self._stamp    = None
+        self._users    = self._merge({})
+
+    def _file_stamp(self):
+        try:
+            st_ = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st_.st_mtime_ns, st_.st_size)
+
+    def _read_file(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _merge(self, saved: dict) -> dict:
+        users = {k: v.copy() for k, v in self.builtin.items()}
+        for email, info in saved.items():
+            if email not in self.builtin:
+                users[email] = info
+            else:
+                users[email]["active"] = info.get("active", True)
+                if info.get("role"):
+                    users[email]["role"] = info["role"]
+        return users
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self) -> dict:
+        """Current users (a copy the caller may modify)."""
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp != self._stamp:
+                self._users = self._merge(self._read_file()) if stamp else self._merge({})
+                self._stamp = stamp
+            return copy.deepcopy(self._users)
+
+    def update(self, mutate):
+        """Apply `mutate(users)` to the latest users and persist atomically.
+
+        Returns whatever `mutate` returns; if it returns False nothing is written.
+        """
+        with self._lock, self._file_lock():
+            users  = self._merge(self._read_file())
+            result = mutate(users)
+            if result is not False:
+                tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump(users, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            self._users = users
+            self._stamp = self._file_stamp()
+            return result